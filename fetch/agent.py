@@ -1,11 +1,38 @@
-from uagents import Agent
+from uagents import Agent, Context
 
 # Protocols
 from protocols.health_proto import create_health_protocol
 from protocols.chat_proto import chat_proto
 from protocols.stripe_payment_proto import stripe_payment_proto
 # Settings
-from config.settings import ASI1_BASE_URL, ASI1_HEADERS
+from config.settings import (
+    ASI1_BASE_URL,
+    ASI1_HEADERS,
+    METRICS_LOG_INTERVAL,
+    INVENTORY_SYNC_INTERVAL,
+    PENDING_TRANSFER_SWEEP_INTERVAL,
+    BALANCE_JOURNAL_POLL_INTERVAL,
+    STORAGE_BACKEND,
+)
+# Utils
+from utils.pricing import get_price_cache_stats
+from utils.price_providers import get_provider_stats
+from utils.singleflight import get_singleflight_stats
+from utils.canister import get_canister_cache_stats, get_canister_metadata_stats
+from utils.balance_cache import get_balance_cache_stats, sync_payout_journal
+from utils.addresses import get_address_cache_stats
+from utils.http_client import run_blocking
+from utils.inventory import sync_inventory, get_inventory_stats
+from utils.pending_transfers import sweep_expired, get_pending_transfer_stats
+from utils.token_index import token_index
+from utils.storage import SQLiteStorage
+from utils.identity_store import migrate_legacy_identities
+from utils.identity_pool import start_identity_pool, get_identity_pool_stats
+from utils.intent import get_intent_stats
+from utils.routing_cache import get_routing_cache_stats
+from utils.tool_selection import get_tool_selection_stats
+from utils.dispatcher import get_dispatcher_stats
+from utils.streaming import get_streaming_stats
 
 # Setup agent
 AGENT_NAME = 'Nara Wallet Agent'
@@ -19,11 +46,68 @@ agent = Agent(
 )
 agent.location = {"latitude": -6.9175, "longitude": 107.6191}
 
+# Contexts are built with agent._storage, so swapping it here moves all ctx.storage access to SQLite
+if STORAGE_BACKEND == "sqlite":
+    sqlite_storage = SQLiteStorage()
+    imported = sqlite_storage.import_from(agent.storage)
+    if imported:
+        print(f"[Storage] Imported {imported} keys from the JSON store")
+    # Here rather than on the first message: one batched write before any handler runs
+    migrate_legacy_identities(sqlite_storage)
+    agent._storage = sqlite_storage
+
 # Attach protocols to agent
 health_protocol = create_health_protocol(agent, AGENT_NAME)
 agent.include(health_protocol, publish_manifest=True)
 agent.include(chat_proto, publish_manifest=True)
 agent.include(stripe_payment_proto, publish_manifest=True)
 
+@agent.on_event("startup")
+async def load_token_index(ctx: Context):
+    token_index.load()
+    token_index.start_background_refresh()
+    ctx.logger.info(f"[TokenIndex] Loaded {len(token_index)} coins")
+
+@agent.on_event("startup")
+async def fill_identity_pool(ctx: Context):
+    start_identity_pool()
+
+@agent.on_interval(period=INVENTORY_SYNC_INTERVAL)
+async def refresh_inventory(ctx: Context):
+    # Also runs once at startup, so the buy path normally never waits on the canister
+    try:
+        await sync_inventory()
+    except Exception as e:
+        ctx.logger.info(f"[inventory] sync failed: {e}")
+
+@agent.on_interval(period=BALANCE_JOURNAL_POLL_INTERVAL)
+async def poll_payout_journal(ctx: Context):
+    # Webhook payouts reach the balance cache through here, keeping SQLite off cache hits
+    await run_blocking(sync_payout_journal)
+
+@agent.on_interval(period=PENDING_TRANSFER_SWEEP_INTERVAL)
+async def sweep_pending_transfers(ctx: Context):
+    removed = sweep_expired(ctx.storage)
+    if removed:
+        ctx.logger.info(f"[pending] swept {removed} expired confirmations")
+
+@agent.on_interval(period=METRICS_LOG_INTERVAL)
+async def log_metrics(ctx: Context):
+    ctx.logger.info(f"[metrics] price_cache={get_price_cache_stats()}")
+    ctx.logger.info(f"[metrics] price_providers={get_provider_stats()}")
+    ctx.logger.info(f"[metrics] singleflight={get_singleflight_stats()}")
+    ctx.logger.info(f"[metrics] canister_cache={get_canister_cache_stats()}")
+    ctx.logger.info(f"[metrics] canister_metadata={get_canister_metadata_stats()}")
+    ctx.logger.info(f"[metrics] balance_cache={get_balance_cache_stats()}")
+    ctx.logger.info(f"[metrics] address_cache={get_address_cache_stats()}")
+    ctx.logger.info(f"[metrics] inventory={get_inventory_stats()}")
+    ctx.logger.info(f"[metrics] pending_transfers={get_pending_transfer_stats()}")
+    ctx.logger.info(f"[metrics] identity_pool={get_identity_pool_stats()}")
+    ctx.logger.info(f"[metrics] intent_fast_path={get_intent_stats()}")
+    ctx.logger.info(f"[metrics] routing_cache={get_routing_cache_stats()}")
+    ctx.logger.info(f"[metrics] tool_selection={get_tool_selection_stats()}")
+    ctx.logger.info(f"[metrics] streaming={get_streaming_stats()}")
+    ctx.logger.info(f"[metrics] dispatcher={get_dispatcher_stats()}")
+
 if __name__ == "__main__":
     agent.run()
\ No newline at end of file
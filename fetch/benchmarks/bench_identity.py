@@ -0,0 +1,65 @@
+"""Session-start identity cost: the old PEM/Identity/probe-sign path vs direct derivation vs the pool.
+
+Run from fetch/:  python benchmarks/bench_identity.py [iterations]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from cryptography.hazmat.primitives import serialization  # noqa: E402
+from cryptography.hazmat.primitives.asymmetric import ed25519  # noqa: E402
+from ic.identity import Identity  # noqa: E402
+from ic.principal import Principal  # noqa: E402
+
+from utils import identity_pool  # noqa: E402
+from utils.identity import _normalize_privkey_to_hex, generate_ed25519_identity  # noqa: E402
+
+
+def _old_generate_ed25519_identity():
+    # The previous implementation, kept here for comparison
+    sk = ed25519.Ed25519PrivateKey.generate()
+    priv_pem = sk.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption(),
+    ).decode("utf-8")
+    priv_b64 = "".join(l for l in priv_pem.splitlines() if not l.startswith("-----"))
+    ic_identity = Identity(privkey=_normalize_privkey_to_hex(priv_b64))
+    der_pubkey, _ = ic_identity.sign(b"probe")
+    return Principal.self_authenticating(der_pubkey).to_str(), priv_b64, der_pubkey
+
+
+def _time_us(fn, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    # Same principal for the same key either way
+    principal, priv_b64, _ = generate_ed25519_identity()
+    der_pubkey, _ = Identity(privkey=_normalize_privkey_to_hex(priv_b64)).sign(b"probe")
+    assert Principal.self_authenticating(der_pubkey).to_str() == principal
+
+    old_us = _time_us(_old_generate_ed25519_identity, iterations)
+    new_us = _time_us(generate_ed25519_identity, iterations)
+
+    identity_pool.start_identity_pool()
+    while len(identity_pool._pool) < identity_pool.IDENTITY_POOL_SIZE:
+        time.sleep(0.01)
+    # Pops within the pool size never wait for key generation
+    pops = min(iterations, identity_pool.IDENTITY_POOL_SIZE - identity_pool.IDENTITY_POOL_LOW_WATERMARK)
+    pool_us = _time_us(identity_pool.take_identity, pops)
+
+    print(f"old path (PEM + Identity + probe sign): {old_us:8.1f} us/identity")
+    print(f"direct derivation:                      {new_us:8.1f} us/identity  ({old_us / new_us:.1f}x)")
+    print(f"pool pop:                               {pool_us:8.1f} us/identity  ({old_us / pool_us:.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Per-request canister setup cost: uncached make_canister vs the two-level cache.
+
+Run from fetch/:  python benchmarks/bench_make_canister.py [iterations]
+
+Builds the three canisters call_endpoint needs per request (wallet, icp_ledger, ai)
+for whichever of them have a .did file available. No network calls are made.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# Dummy ids so the benchmark runs without a dfx .env
+for _name in ("WALLET", "ICP_LEDGER", "AI"):
+    os.environ.setdefault(f"CANISTER_ID_{_name}", "ryjl3-tyaaa-aaaaa-aaaba-cai")
+
+from utils import canister as canister_utils  # noqa: E402
+from utils.identity import generate_ed25519_identity  # noqa: E402
+
+
+def _available_canisters():
+    names = []
+    for name in ("wallet", "icp_ledger", "ai"):
+        if os.path.isfile(canister_utils._get_candid_path(name)):
+            names.append(name)
+    return names
+
+
+def _time_per_request(fn, names, keys, iterations):
+    started = time.perf_counter()
+    for i in range(iterations):
+        key = keys[i % len(keys)]
+        for name in names:
+            fn(name, key)
+    return (time.perf_counter() - started) / iterations * 1000
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    names = _available_canisters()
+    if not names:
+        print("No .did files found (run from fetch/, or run dfx generate first)")
+        return
+    keys = [generate_ed25519_identity()[1] for _ in range(5)]
+
+    before = _time_per_request(canister_utils._build_canister, names, keys, iterations)
+
+    started = time.perf_counter()
+    for name in names:
+        canister_utils._candid_template(name)
+    first_parse = (time.perf_counter() - started) * 1000
+
+    # New identity, Candid already parsed: only key decode + agent + method binding
+    cold_keys = [generate_ed25519_identity()[1] for _ in range(iterations)]
+    new_identity = _time_per_request(canister_utils.make_canister, names, cold_keys, iterations)
+    # Returning identity: LRU hit
+    for key in keys:
+        for name in names:
+            canister_utils.make_canister(name, key)
+    warm = _time_per_request(canister_utils.make_canister, names, keys, iterations)
+
+    print(f"canisters per request: {', '.join(names)}")
+    print(f"uncached (before):            {before:8.2f} ms/request")
+    print(f"one-time Candid parse:        {first_parse:8.2f} ms")
+    print(f"cached Candid, new identity:  {new_identity:8.2f} ms/request")
+    print(f"cached Candid + LRU hit:      {warm:8.4f} ms/request")
+    print(f"cache stats: {canister_utils.get_canister_cache_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""Agent state at scale: uagents JSON KeyValueStore vs the SQLite (WAL) backend.
+
+Run from fetch/:  python benchmarks/bench_storage.py [users] [writer_processes]
+
+Simulates `users` senders, each with an identity and a pending confirmation,
+then measures lookups, single writes (one per chat turn) and concurrent
+writers in separate processes (the agent and webhook.py share the file).
+Everything is written to a temporary directory.
+"""
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from multiprocessing import Process
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+_tmp = tempfile.mkdtemp(prefix="nara_bench_")
+os.environ["SHARED_STATE_DB"] = os.path.join(_tmp, "bench_state.db")
+
+from uagents.storage import KeyValueStore  # noqa: E402
+
+from utils.storage import SQLiteStorage  # noqa: E402
+
+
+def _identity(i):
+    return {
+        "principal": f"{i:05x}-principal-aaaaa-aaaaa-cai",
+        "private_key": "k" * 88,
+        "public_key": "p" * 44,
+        "sender": f"agent1q{i:020d}",
+    }
+
+
+def _pending(i, now):
+    return {"type": "send", "coin": "ICP", "amount": "0.1", "to": f"dest{i}", "created_at": now, "expires_at": now + 300}
+
+
+def _percentiles(samples_ms):
+    samples_ms = sorted(samples_ms)
+    return (
+        statistics.median(samples_ms),
+        samples_ms[min(len(samples_ms) - 1, int(len(samples_ms) * 0.99))],
+    )
+
+
+def _report(label, samples_ms):
+    p50, p99 = _percentiles(samples_ms)
+    print(f"  {label:<34} p50={p50:9.4f} ms  p99={p99:9.4f} ms")
+
+
+def _bench_json(users, senders):
+    print(f"JSON KeyValueStore ({users} users)")
+    store = KeyValueStore("bench_json", cwd=_tmp)
+    now = time.time()
+    # Populate in memory, then persist once: calling set() per user would rewrite the file 2*users times
+    for i in range(users):
+        store._data[f"identity:{senders[i]}"] = _identity(i)
+        store._data[f"pending_transfer:{senders[i]}"] = _pending(i, now)
+    started = time.perf_counter()
+    store._save()
+    print(f"  file size {os.path.getsize(store._path) / 1e6:.1f} MB, one full save {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    reads = []
+    for sender in random.sample(senders, 1000):
+        t = time.perf_counter()
+        store.get(f"identity:{sender}")
+        reads.append((time.perf_counter() - t) * 1000)
+    _report("identity lookup", reads)
+
+    # Legacy layout: all identities in one list, scanned per message
+    legacy = list(store._data[f"identity:{s}"] for s in senders)
+    scans = []
+    for sender in random.sample(senders, 50):
+        t = time.perf_counter()
+        next((item for item in legacy if item["sender"] == sender), None)
+        scans.append((time.perf_counter() - t) * 1000)
+    _report("legacy identity list scan", scans)
+
+    writes = []
+    for i, sender in enumerate(random.sample(senders, 20)):
+        t = time.perf_counter()
+        store.set(f"pending_transfer:{sender}", _pending(i, now))
+        writes.append((time.perf_counter() - t) * 1000)
+    _report("pending confirmation write", writes)
+
+    t = time.perf_counter()
+    KeyValueStore("bench_json", cwd=_tmp)
+    print(f"  startup load {(time.perf_counter() - t) * 1000:.1f} ms")
+
+
+def _bench_sqlite(users, senders):
+    print(f"SQLite WAL backend ({users} users)")
+    storage = SQLiteStorage()
+    now = time.time()
+    started = time.perf_counter()
+    storage.set_many(
+        item
+        for i in range(users)
+        for item in ((f"identity:{senders[i]}", _identity(i)), (f"pending_transfer:{senders[i]}", _pending(i, now)))
+    )
+    print(f"  batched insert of {2 * users} rows {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    reads = []
+    for sender in random.sample(senders, 1000):
+        t = time.perf_counter()
+        storage.get(f"identity:{sender}")
+        reads.append((time.perf_counter() - t) * 1000)
+    _report("identity lookup", reads)
+
+    writes = []
+    for i, sender in enumerate(random.sample(senders, 1000)):
+        t = time.perf_counter()
+        storage.set(f"pending_transfer:{sender}", _pending(i, now))
+        writes.append((time.perf_counter() - t) * 1000)
+    _report("pending confirmation write", writes)
+
+    t = time.perf_counter()
+    expired = storage.delete_expired_pending(now + 301)
+    print(f"  expiry sweep of {expired} rows {(time.perf_counter() - t) * 1000:.1f} ms")
+
+
+def _writer(worker, senders, count):
+    storage = SQLiteStorage()
+    now = time.time()
+    for i in range(count):
+        sender = senders[(worker * count + i) % len(senders)]
+        storage.set(f"pending_transfer:{sender}", _pending(i, now))
+        storage.get(f"identity:{sender}")
+
+
+def _bench_concurrent(senders, processes, per_process=2000):
+    print(f"SQLite concurrent writers ({processes} processes x {per_process} write+read)")
+    workers = [Process(target=_writer, args=(w, senders, per_process)) for w in range(processes)]
+    started = time.perf_counter()
+    for p in workers:
+        p.start()
+    for p in workers:
+        p.join()
+    elapsed = time.perf_counter() - started
+    failed = sum(1 for p in workers if p.exitcode != 0)
+    print(f"  {processes * per_process / elapsed:,.0f} write+read/s overall, {failed} failed processes")
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    processes = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    senders = [f"agent1q{i:020d}" for i in range(users)]
+    random.seed(7)
+    _bench_json(users, senders)
+    _bench_sqlite(users, senders)
+    _bench_concurrent(senders, processes)
+    print(f"Scratch files in {_tmp}")
+
+
+if __name__ == "__main__":
+    main()
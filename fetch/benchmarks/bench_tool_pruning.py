@@ -0,0 +1,94 @@
+"""ASI1 tool-selection request size: the full tool list vs the pruned, pre-serialized subset.
+
+Tokens are estimated as characters / 4. With --live (and ASI1_API_KEY set) each sample query
+is also sent to ASI1 both ways to compare end-to-end latency.
+
+Run from fetch/:  python benchmarks/bench_tool_pruning.py [iterations] [--live]
+"""
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from config.tools import tools  # noqa: E402
+from utils.tool_selection import full_tool_set, select_tools, tool_request_body  # noqa: E402
+
+QUERIES = [
+    "what's the price of bitcoin right now?",
+    "how much eth do I have",
+    "show me my solana deposit address",
+    "transfer 0.5 sol to my friend",
+    "I want to buy some ICP with my card",
+    "where can I sell btc for the best price?",
+    "give me an overview of all my assets",
+    "what can you do?",
+    "tell me something about blockchains",
+]
+
+
+def _payload(query):
+    return {
+        "model": "asi1-mini",
+        "messages": [{"role": "user", "content": query}],
+        "temperature": 0.2,
+        "max_tokens": 1024,
+    }
+
+
+def _time_us(fn, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def _live_ms(body):
+    from config.settings import ASI1_BASE_URL, ASI1_HEADERS
+    from utils.http_client import http_post
+
+    started = time.perf_counter()
+    http_post(f"{ASI1_BASE_URL}/chat/completions", headers=ASI1_HEADERS, data=body).raise_for_status()
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    iterations = int(args[0]) if args else 5000
+    live = "--live" in sys.argv and os.getenv("ASI1_API_KEY")
+
+    full_sizes, pruned_sizes, live_full, live_pruned = [], [], [], []
+    print(f"{'query':45} {'tools':>5} {'full tok':>8} {'sent tok':>8}")
+    for query in QUERIES:
+        subset = select_tools(query)
+        full_body = json.dumps({**_payload(query), "tools": tools}).encode("utf-8")
+        body = tool_request_body(_payload(query), subset)
+        assert json.loads(body) == {**_payload(query), "tools": subset.schemas}
+        full_sizes.append(len(full_body))
+        pruned_sizes.append(len(body))
+        print(f"{query[:45]:45} {len(subset.names):5d} {len(full_body) // 4:8d} {len(body) // 4:8d}")
+        if live:
+            live_full.append(_live_ms(tool_request_body(_payload(query), full_tool_set())))
+            live_pruned.append(_live_ms(body))
+
+    saved = 1 - sum(pruned_sizes) / sum(full_sizes)
+    print(f"\nprompt tokens per request: {statistics.mean(full_sizes) / 4:.0f} -> "
+          f"{statistics.mean(pruned_sizes) / 4:.0f} (-{saved:.0%})")
+
+    query = QUERIES[1]
+    full_us = _time_us(lambda: json.dumps({**_payload(query), "tools": tools}), iterations)
+    pruned_us = _time_us(lambda: tool_request_body(_payload(query), select_tools(query)), iterations)
+    print(f"build body, full list serialized per request: {full_us:7.1f} us")
+    print(f"build body, score + cached subset:            {pruned_us:7.1f} us")
+
+    if live:
+        print(f"ASI1 latency, full list: {statistics.median(live_full):7.0f} ms (median)")
+        print(f"ASI1 latency, pruned:    {statistics.median(live_pruned):7.0f} ms (median)")
+    else:
+        print("ASI1 latency not measured (pass --live with ASI1_API_KEY set)")
+
+
+if __name__ == "__main__":
+    main()
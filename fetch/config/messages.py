@@ -22,4 +22,9 @@ welcome_message = (
     "- I want to buy 0.003 Bitcoin\n"
     "- How much is 1 Ethereum in USD right now?\n"
     "- I want to check the best market price to sell 1 BTC for USDT\n"
-)
\ No newline at end of file
+)
+
+busy_message = (
+    "I'm handling a lot of requests right now and couldn't queue this one. "
+    "Please send it again in a moment."
+)
@@ -1,4 +1,8 @@
 import os
+from dotenv import load_dotenv
+
+# Load .env before any setting is read, whichever module imports settings first
+load_dotenv()
 
 # ASI1 API settings
 ASI1_API_KEY = os.getenv("ASI1_API_KEY")
@@ -12,3 +16,131 @@ ASI1_HEADERS = {
 STRIPE_API_URL = "https://api.stripe.com/v1"
 STRIPE_API_KEY = os.getenv("STRIPE_API_KEY")
 STRIPE_WEBHOOK_URL = os.getenv("STRIPE_WEBHOOK_URL")
+
+# Price cache settings (seconds)
+PRICE_CACHE_TTL = float(os.getenv("PRICE_CACHE_TTL", "30"))
+# How long past the TTL a price may still be served while it is refreshed in the background
+PRICE_CACHE_STALE_TTL = float(os.getenv("PRICE_CACHE_STALE_TTL", "300"))
+# Per-coin TTL overrides, e.g. "BTC=15,ETH=15,USDT=600"
+PRICE_CACHE_TTL_OVERRIDES = {
+    k.strip().upper(): float(v)
+    for k, v in (
+        item.split("=", 1) for item in os.getenv("PRICE_CACHE_TTL_OVERRIDES", "").split(",") if "=" in item
+    )
+}
+
+# How often the agent logs its cache/metrics counters (seconds)
+METRICS_LOG_INTERVAL = float(os.getenv("METRICS_LOG_INTERVAL", "300"))
+
+# Local token-resolution index (coin ids, symbols, names, aliases)
+TOKEN_INDEX_PATH = os.getenv("TOKEN_INDEX_PATH", "token_index.json")
+TOKEN_INDEX_REFRESH_INTERVAL = float(os.getenv("TOKEN_INDEX_REFRESH_INTERVAL", "21600"))
+# Coins learned from live lookups are written to disk at most once per this many seconds
+TOKEN_INDEX_SAVE_DELAY = float(os.getenv("TOKEN_INDEX_SAVE_DELAY", "30"))
+
+# Price providers: per-request timeout and hedge delay (seconds)
+PRICE_PROVIDER_TIMEOUT = float(os.getenv("PRICE_PROVIDER_TIMEOUT", "5"))
+PRICE_HEDGE_DELAY = float(os.getenv("PRICE_HEDGE_DELAY", "0.3"))
+# Per-provider circuit breaker
+PRICE_BREAKER_WINDOW = int(os.getenv("PRICE_BREAKER_WINDOW", "20"))
+PRICE_BREAKER_MIN_CALLS = int(os.getenv("PRICE_BREAKER_MIN_CALLS", "5"))
+PRICE_BREAKER_ERROR_RATE = float(os.getenv("PRICE_BREAKER_ERROR_RATE", "0.5"))
+PRICE_BREAKER_CONSECUTIVE_FAILURES = int(os.getenv("PRICE_BREAKER_CONSECUTIVE_FAILURES", "3"))
+PRICE_BREAKER_COOLDOWN = float(os.getenv("PRICE_BREAKER_COOLDOWN", "30"))
+
+# Shared outbound HTTP client (seconds / counts)
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "30"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "2"))
+HTTP_RETRY_BACKOFF = float(os.getenv("HTTP_RETRY_BACKOFF", "0.2"))
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "20"))
+HTTP_MAX_WORKERS = int(os.getenv("HTTP_MAX_WORKERS", "32"))
+
+# Max ready-to-use Canister objects kept per process (LRU, keyed by canister + identity)
+CANISTER_CACHE_SIZE = int(os.getenv("CANISTER_CACHE_SIZE", "256"))
+
+# Decoded private keys (memory only): max identities kept and seconds unused before one is dropped
+IDENTITY_CACHE_SIZE = int(os.getenv("IDENTITY_CACHE_SIZE", "512"))
+IDENTITY_CACHE_IDLE_TTL = float(os.getenv("IDENTITY_CACHE_IDLE_TTL", "1800"))
+
+# Canister calls: worker threads, max concurrent calls per canister, per-call timeout (seconds)
+CANISTER_MAX_WORKERS = int(os.getenv("CANISTER_MAX_WORKERS", "16"))
+CANISTER_CONCURRENCY = int(os.getenv("CANISTER_CONCURRENCY", "8"))
+CANISTER_CALL_TIMEOUT = float(os.getenv("CANISTER_CALL_TIMEOUT", "90"))
+
+# Static canister metadata (coin_network, get_supported_exchanges, get_model_info):
+# cache TTL, and how often the canister module hash is checked for upgrades (seconds)
+CANISTER_METADATA_TTL = float(os.getenv("CANISTER_METADATA_TTL", "21600"))
+CANISTER_MODULE_HASH_CHECK_INTERVAL = float(os.getenv("CANISTER_MODULE_HASH_CHECK_INTERVAL", "300"))
+
+# Per-address balance cache (seconds); per-coin overrides, e.g. "BTC=60,SOL=5"
+BALANCE_CACHE_TTL = float(os.getenv("BALANCE_CACHE_TTL", "15"))
+BALANCE_CACHE_TTL_OVERRIDES = {
+    k.strip().upper(): float(v)
+    for k, v in (
+        item.split("=", 1) for item in os.getenv("BALANCE_CACHE_TTL_OVERRIDES", "BTC=60").split(",") if "=" in item
+    )
+}
+# How often the agent reads new webhook payouts from the shared journal (seconds)
+BALANCE_JOURNAL_POLL_INTERVAL = float(os.getenv("BALANCE_JOURNAL_POLL_INTERVAL", "2"))
+
+# In-memory per-sender address cache in front of storage: max senders and seconds kept
+ADDRESS_CACHE_SIZE = int(os.getenv("ADDRESS_CACHE_SIZE", "10000"))
+ADDRESS_CACHE_TTL = float(os.getenv("ADDRESS_CACHE_TTL", "3600"))
+
+# SQLite file shared by the agent and webhook.py (payout journal, inventory ledger)
+SHARED_STATE_DB = os.getenv("SHARED_STATE_DB", "nara_state.db")
+
+# Pre-generated user identities kept ready for new sessions; refilled below the low watermark
+IDENTITY_POOL_SIZE = int(os.getenv("IDENTITY_POOL_SIZE", "64"))
+IDENTITY_POOL_LOW_WATERMARK = int(os.getenv("IDENTITY_POOL_LOW_WATERMARK", "16"))
+
+# Parse common unambiguous commands locally instead of asking ASI1 which tool to call
+INTENT_FAST_PATH = os.getenv("INTENT_FAST_PATH", "true").strip().lower() in ("1", "true", "yes", "on")
+
+# Tools whose results still get the ASI1 formatting pass (comma-separated); all others use local templates
+LLM_FORMATTED_TOOLS = {
+    name.strip() for name in os.getenv("LLM_FORMATTED_TOOLS", "best_market_price").split(",") if name.strip()
+}
+
+# Max tool calls from one message executed concurrently
+TOOL_CALL_CONCURRENCY = int(os.getenv("TOOL_CALL_CONCURRENCY", "4"))
+
+# Stream final ASI1 answers to the user as several messages: first chunk size, later chunk size
+# (characters) and max seconds between chunks. WORKING_MESSAGE_DELAY: seconds a tool may run
+# before the user is told it is still working
+ASI1_STREAMING = os.getenv("ASI1_STREAMING", "true").strip().lower() in ("1", "true", "yes", "on")
+STREAM_FIRST_FLUSH_CHARS = int(os.getenv("STREAM_FIRST_FLUSH_CHARS", "40"))
+STREAM_FLUSH_CHARS = int(os.getenv("STREAM_FLUSH_CHARS", "200"))
+STREAM_FLUSH_INTERVAL = float(os.getenv("STREAM_FLUSH_INTERVAL", "1.0"))
+WORKING_MESSAGE_DELAY = float(os.getenv("WORKING_MESSAGE_DELAY", "2.0"))
+
+# Routing cache for ASI1 tool choices per query shape: max signatures kept, and how many
+# consistent model choices (and what agreement ratio) are needed before one is reused
+ROUTING_CACHE_SIZE = int(os.getenv("ROUTING_CACHE_SIZE", "2048"))
+ROUTING_CACHE_MIN_AGREEMENTS = int(os.getenv("ROUTING_CACHE_MIN_AGREEMENTS", "2"))
+ROUTING_CACHE_MIN_CONFIDENCE = float(os.getenv("ROUTING_CACHE_MIN_CONFIDENCE", "0.8"))
+
+# Send ASI1 only the top-k tool schemas relevant to the query. A query whose best tool scores
+# below TOOL_PRUNE_MIN_SCORE (no action keyword matched) gets the full tool list
+TOOL_PRUNING = os.getenv("TOOL_PRUNING", "true").strip().lower() in ("1", "true", "yes", "on")
+TOOL_PRUNE_TOP_K = int(os.getenv("TOOL_PRUNE_TOP_K", "6"))
+TOOL_PRUNE_MIN_SCORE = int(os.getenv("TOOL_PRUNE_MIN_SCORE", "2"))
+
+# Chat dispatcher: worker tasks shared by all senders, and how many messages may wait per sender
+# and in total before new ones get a "busy, retry" reply
+CHAT_WORKERS = int(os.getenv("CHAT_WORKERS", "8"))
+CHAT_SENDER_QUEUE_LIMIT = int(os.getenv("CHAT_SENDER_QUEUE_LIMIT", "5"))
+CHAT_QUEUE_LIMIT = int(os.getenv("CHAT_QUEUE_LIMIT", "200"))
+
+# Agent storage backend: "sqlite" (tables in SHARED_STATE_DB) or "json" (uagents key/value file)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "sqlite").strip().lower()
+
+# Buy-flow inventory ledger: canister balance sync interval and reservation lifetime (seconds).
+# The webhook refuses sessions older than 5 minutes, so a reservation cannot be paid out after that.
+INVENTORY_SYNC_INTERVAL = float(os.getenv("INVENTORY_SYNC_INTERVAL", "60"))
+INVENTORY_RESERVATION_TTL = float(os.getenv("INVENTORY_RESERVATION_TTL", "360"))
+
+# Pending send/buy confirmations: lifetime and expiry sweep granularity (seconds)
+PENDING_TRANSFER_TTL = float(os.getenv("PENDING_TRANSFER_TTL", "300"))
+PENDING_TRANSFER_SWEEP_INTERVAL = float(os.getenv("PENDING_TRANSFER_SWEEP_INTERVAL", "30"))
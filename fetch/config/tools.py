@@ -142,6 +142,20 @@ tools = [
             "strict": True
         }
     },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_portfolio",
+            "description": "Gets the balances of all coins (bitcoin, ethereum, solana and ICP) of the user with their USD value and the total.",
+            "parameters": {
+                "type": "object",
+                "properties": {},
+                "required": [],
+                "additionalProperties": False
+            },
+            "strict": True
+        }
+    },
     {
         "type": "function",
         "function": {
@@ -234,29 +248,6 @@ tools = [
             "strict": True
         }
     },
-    {
-        "type": "function",
-        "function": {
-            "name": "send_icp",
-            "description": "Sends ICP from my wallet to a specified address.",
-            "parameters": {
-                "type": "object",
-                "properties": {
-                    "destinationAddress": {
-                        "type": "string",
-                        "description": "The destination ICP address."
-                    },
-                    "amount": {
-                        "type": "number",
-                        "description": "Amount to send in ICP."
-                    }
-                },
-                "required": ["destinationAddress", "amount"],
-                "additionalProperties": False
-            },
-            "strict": True
-        }
-    },
     {
         "type": "function",
         "function": {
@@ -1,8 +1,9 @@
+import asyncio
 import json
-import requests
 from datetime import datetime, timezone
 from uuid import uuid4
 from decimal import Decimal
+from typing import Awaitable, Callable
 from uagents_core.contrib.protocols.chat import (
     chat_protocol_spec,
     ChatMessage,
@@ -13,22 +14,42 @@ from uagents_core.contrib.protocols.chat import (
 from uagents import Context, Protocol
 
 # Utils
-from utils.canister import make_canister
+from utils.canister import make_async_canister, get_canister_metadata
 from utils.coin import to_amount, to_smallest
-from utils.pricing import get_price_usd, get_price_usd_number
-from utils.identity import generate_ed25519_identity
+from utils.pricing import get_price_usd, get_price_usd_number, get_prices_usd, format_usd_value
 from utils.candid import unwrap_candid
 from utils.context import get_private_key_for_sender, get_principal_for_sender
-from utils.stripe import create_checkout_session
+from utils.identity_store import ensure_identity
+from utils.pending_transfers import get_pending_transfer, set_pending_transfer, clear_pending_transfer
+from utils.addresses import get_address_for_sender, prefetch_addresses
+from utils.balance_cache import get_balance, invalidate_balance
+from utils.inventory import available_inventory, create_reserved_checkout, InsufficientInventoryError
 from utils.text import is_greeting
+from utils.intent import fast_tool_calls
+from utils.routing_cache import cached_tool_calls, remember_tool_calls
+from utils.dispatcher import submit
+from utils.tool_selection import select_tools, full_tool_set, record_full_retry, tool_request_body, ToolSubset
+from utils.streaming import stream_reply
+from utils.formatting import render_tool_result, render_tool_error, render_checkout, has_template
+from utils.http_client import ahttp_post, run_blocking
 
 # Config
-from config.messages import help_message, welcome_message
-from config.tools import tools
-from config.settings import ASI1_BASE_URL, ASI1_HEADERS
+from config.messages import help_message, welcome_message, busy_message
+from config.settings import (
+    ASI1_BASE_URL,
+    ASI1_HEADERS,
+    ASI1_STREAMING,
+    INTENT_FAST_PATH,
+    LLM_FORMATTED_TOOLS,
+    TOOL_CALL_CONCURRENCY,
+    WORKING_MESSAGE_DELAY,
+)
+
+# Sends one text message to the user
+Reply = Callable[[str], Awaitable[None]]
 
 async def get_crypto_price(ctx: Context, coin_type: str, amount_in_token: float):
-    return get_price_usd(coin_type, amount_in_token, logger=ctx.logger)
+    return await run_blocking(get_price_usd, coin_type, amount_in_token, logger=ctx.logger)
 
 def _explorer_address_url(coin: str, network: str, address: str) -> str | None:
     c = (coin or "").upper()
@@ -64,42 +85,153 @@ def _explorer_address_url(coin: str, network: str, address: str) -> str | None:
         return f"https://dashboard.internetcomputer.org/principal/{addr}"
     return None
 
+async def _coin_networks(wallet_canister) -> dict:
+    """Network per chain (cached canister metadata); empty when unavailable."""
+    try:
+        networks = unwrap_candid(await get_canister_metadata(wallet_canister, "coin_network"))
+    except Exception:
+        return {}
+    return networks if isinstance(networks, dict) else {}
+
+# Coin valued by each balance tool, so one turn can be priced in a single batch
+_BALANCE_TOOL_COINS = {
+    "get_bitcoin_balance": "BTC",
+    "get_ethereum_balance": "ETH",
+    "get_solana_balance": "SOL",
+    "get_icp_balance": "ICP",
+}
+
+async def _prefetch_prices_for_tools(ctx: Context, tool_calls: list) -> None:
+    """Warm the price cache for every asset valued in this turn with one upstream request."""
+    coins = sorted({
+        _BALANCE_TOOL_COINS[tc["function"]["name"]]
+        for tc in tool_calls
+        if tc.get("function", {}).get("name") in _BALANCE_TOOL_COINS
+    })
+    if len(coins) < 2:
+        return
+    try:
+        await run_blocking(get_prices_usd, coins, logger=ctx.logger)
+    except Exception as e:
+        ctx.logger.info(f"[pricing] batch prefetch failed: {e}")
+
+async def _request_tool_selection(user_message: dict, subset: ToolSubset) -> dict:
+    """Ask ASI1 which tools to call, offering only the schemas in subset (pre-serialized)."""
+    payload = {
+        "model": "asi1-mini",
+        "messages": [user_message],
+        "temperature": 0.2,
+        "max_tokens": 1024
+    }
+    response = await ahttp_post(
+        f"{ASI1_BASE_URL}/chat/completions",
+        headers=ASI1_HEADERS,
+        data=tool_request_body(payload, subset)
+    )
+    response.raise_for_status()
+    return response.json()
+
+# Wallet canister chain name per coin, for its <chain>_balance methods
+_WALLET_CHAINS = {"BTC": "bitcoin", "ETH": "ethereum", "SOL": "solana"}
+
+# Coin moved by each send tool; its cached balances are dropped after the call
+_SEND_TOOL_COINS = {
+    "send_bitcoin": "BTC",
+    "send_ethereum": "ETH",
+    "send_solana": "SOL",
+    "send_icp": "ICP",
+}
+
+async def _sender_balance(ctx: Context, wallet_canister, icp_ledger_canister, coin: str) -> dict:
+    """The sender's balance for one coin, served from the short-TTL balance cache when possible."""
+    address = await get_address_for_sender(ctx, coin)
+
+    async def _load():
+        if coin == "ICP":
+            raw_balance = await icp_ledger_canister.icrc1_balance_of({"owner": address, "subaccount": []})
+        else:
+            raw_balance = await getattr(wallet_canister, f"{_WALLET_CHAINS[coin]}_balance")(address)
+        return unwrap_candid(raw_balance)
+
+    balance_smallest, age = await get_balance(coin, address, _load)
+    return {
+        "coin": coin,
+        "address": address,
+        "balance": to_amount(coin, balance_smallest),
+        "balance_age_seconds": round(age),
+    }
+
+async def _invalidate_balances_after_send(ctx: Context, coin: str, destination: str | None) -> None:
+    # Runs even when the send failed or timed out: its outcome may be unknown
+    try:
+        invalidate_balance(coin, await get_address_for_sender(ctx, coin))
+    except Exception as e:
+        ctx.logger.info(f"[balance] could not invalidate {coin} balance: {e}")
+    if destination:
+        invalidate_balance(coin, destination)
+
+async def _get_portfolio(ctx: Context, wallet_canister, icp_ledger_canister) -> dict:
+    """All chain balances queried concurrently, valued with one batched price lookup."""
+    coins = list(_WALLET_CHAINS) + ["ICP"]
+    prices_task = asyncio.ensure_future(run_blocking(get_prices_usd, coins, logger=ctx.logger))
+    balances = await asyncio.gather(
+        *(_sender_balance(ctx, wallet_canister, icp_ledger_canister, coin) for coin in coins),
+        return_exceptions=True,
+    )
+    try:
+        prices = await prices_task
+    except Exception as e:
+        ctx.logger.info(f"[get_portfolio] price lookup failed: {e}")
+        prices = {}
+
+    assets = []
+    total_usd = Decimal(0)
+    for coin, balance in zip(coins, balances):
+        if isinstance(balance, Exception):
+            # One slow or failing chain must not hide the others
+            ctx.logger.info(f"[get_portfolio] {coin} balance failed: {balance}")
+            assets.append({"coin": coin, "balance": None, "price_usd": None, "error": str(balance)})
+            continue
+        price = prices.get(coin)
+        if price is not None:
+            total_usd += Decimal(balance["balance"]) * price
+        assets.append({**balance, "price_usd": format_usd_value(balance["balance"], price)})
+    return {"assets": assets, "total_usd": format_usd_value(total_usd, Decimal(1))}
+
+def _insufficient_inventory_text(coin_type: str, token_amount, available_smallest: int) -> str:
+    return (
+        "Sorry, the canister balance is not sufficient to fulfill your purchase.\n"
+        f"- Asset: {coin_type}\n"
+        f"- Requested: {token_amount} {coin_type}\n"
+        f"- Available: {to_amount(coin_type, max(available_smallest, 0))} {coin_type}\n"
+        "Please reduce the amount or try another asset."
+    )
+
 def _get_pending_transfer_for_sender(ctx: Context) -> dict | None:
     try:
-        pending_transfers = ctx.storage.get("pending_transfers") or {}
-        return pending_transfers.get(getattr(ctx, "sender", None))
+        pending = get_pending_transfer(ctx.storage, getattr(ctx, "sender", None))
     except Exception:
         return None
+    # Expired confirmations are only surfaced to process_query, which rejects them
+    if pending and pending.get("expired"):
+        return None
+    return pending
 
 def _set_pending_transfer_for_sender(ctx: Context, pending: dict) -> None:
-    pending_transfers = ctx.storage.get("pending_transfers") or {}
-    pending_transfers[getattr(ctx, "sender", None)] = pending
-    ctx.storage.set("pending_transfers", pending_transfers)
+    set_pending_transfer(ctx.storage, getattr(ctx, "sender", None), pending)
 
 def _clear_pending_transfer_for_sender(ctx: Context) -> None:
-    pending_transfers = ctx.storage.get("pending_transfers") or {}
-    sender_key = getattr(ctx, "sender", None)
-    if sender_key in pending_transfers:
-        del pending_transfers[sender_key]
-        ctx.storage.set("pending_transfers", pending_transfers)
+    clear_pending_transfer(ctx.storage, getattr(ctx, "sender", None))
 
 
 async def call_endpoint(ctx: Context, func_name: str, args: dict):
     # Create canister
     ctx.logger.info(f"Private key: {get_private_key_for_sender(ctx)}")
-    wallet_canister = make_canister("wallet", get_private_key_for_sender(ctx))
-    icp_ledger_canister = make_canister("icp_ledger", get_private_key_for_sender(ctx))
-    ai_canister = make_canister("ai", get_private_key_for_sender(ctx))
+    wallet_canister = make_async_canister("wallet", get_private_key_for_sender(ctx))
+    icp_ledger_canister = make_async_canister("icp_ledger", get_private_key_for_sender(ctx))
+    ai_canister = make_async_canister("ai", get_private_key_for_sender(ctx))
 
     try:
-        # Fetch coin network info once for address/balance responses
-        networks = None
-        try:
-            networks_raw = wallet_canister.coin_network()
-            networks = unwrap_candid(networks_raw) or {}
-        except Exception:
-            networks = {}
-
         if func_name == "help":
             result = help_message
 
@@ -108,28 +240,28 @@ async def call_endpoint(ctx: Context, func_name: str, args: dict):
             amount_token = Decimal(str(args["amount"]))
             amount_smallest = to_smallest("BTC", amount_token)
             req = {"destination_address": destination, "amount_in_satoshi": amount_smallest}
-            txid = unwrap_candid(wallet_canister.bitcoin_send(req))
+            txid = unwrap_candid(await wallet_canister.bitcoin_send(req))
             result = {"txid": txid}
 
         elif func_name == "send_ethereum":
             destination = args["destinationAddress"]
             amount_token = Decimal(str(args["amount"]))
             amount_smallest = to_smallest("ETH", amount_token)
-            tx_hash = unwrap_candid(wallet_canister.ethereum_send(destination, amount_smallest))
+            tx_hash = unwrap_candid(await wallet_canister.ethereum_send(destination, amount_smallest))
             result = {"txid": tx_hash}
 
         elif func_name == "send_solana":
             destination = args["destinationAddress"]
             amount_token = Decimal(str(args["amount"]))
             amount_smallest = to_smallest("SOL", amount_token)
-            sig = unwrap_candid(wallet_canister.solana_send(destination, amount_smallest))
+            sig = unwrap_candid(await wallet_canister.solana_send(destination, amount_smallest))
             result = {"txid": sig}
 
         elif func_name == "send_icp":
             destination = args["destinationAddress"]
             amount_token = Decimal(str(args["amount"]))
             amount_smallest = to_smallest("ICP", amount_token)
-            send_res = unwrap_candid(wallet_canister.icp_send(destination, amount_smallest))
+            send_res = unwrap_candid(await wallet_canister.icp_send(destination, amount_smallest))
             if isinstance(send_res, dict) and "Ok" in send_res:
                 result = {"block_index": send_res["Ok"]}
             elif isinstance(send_res, dict) and "Err" in send_res:
@@ -156,88 +288,55 @@ async def call_endpoint(ctx: Context, func_name: str, args: dict):
 
             payload = {"symbol": coin_symbol, "side": side, "amount": float(amount), "amount_usd": []}
             ctx.logger.info(f"[best_market_price] payload: {payload}")
-            result = unwrap_candid(ai_canister.predict_trade_cost(payload))
+            result = unwrap_candid(await ai_canister.predict_trade_cost(payload))
             ctx.logger.info(f"Result: {result}")
 
         elif func_name == "get_coin_price":
             result = await get_crypto_price(ctx, args["coin_type"], args["amount"])
             ctx.logger.info(f"Result: {result}")
 
-        elif func_name == "get_bitcoin_balance":
-            address_raw = wallet_canister.bitcoin_address()
-            address = unwrap_candid(address_raw)
-            raw_balance = wallet_canister.bitcoin_balance(address)  # satoshi
-            balance_smallest = unwrap_candid(raw_balance)
-            balance_readable = to_amount("BTC", balance_smallest)
-            try:
-                price_usd = await get_crypto_price(ctx, "BTC", float(balance_readable or 0))
-            except Exception:
-                price_usd = "$0.00"
-            result = {
-                "balance": balance_readable,
-                "price_usd": price_usd,
-            }
-        elif func_name == "get_ethereum_balance":
-            address_raw = wallet_canister.ethereum_address()
-            address = unwrap_candid(address_raw)
-            raw_balance = wallet_canister.ethereum_balance(address)  # wei (string)
-            balance_smallest = unwrap_candid(raw_balance)
-            balance_readable = to_amount("ETH", balance_smallest)
-            try:
-                price_usd = await get_crypto_price(ctx, "ETH", float(balance_readable or 0))
-            except Exception:
-                price_usd = "$0.00"
-            result = {
-                "balance": balance_readable,
-                "price_usd": price_usd,
-            }
-        elif func_name == "get_solana_balance":
-            address_raw = wallet_canister.solana_address()
-            address = unwrap_candid(address_raw)
-            raw_balance = wallet_canister.solana_balance(address)  # lamports (Nat)
-            balance_smallest = unwrap_candid(raw_balance)
-            balance_readable = to_amount("SOL", balance_smallest)
+        elif func_name in _BALANCE_TOOL_COINS:
+            coin = _BALANCE_TOOL_COINS[func_name]
+            balance = await _sender_balance(ctx, wallet_canister, icp_ledger_canister, coin)
             try:
-                price_usd = await get_crypto_price(ctx, "SOL", float(balance_readable or 0))
+                price_usd = await get_crypto_price(ctx, coin, float(balance["balance"] or 0))
             except Exception:
                 price_usd = "$0.00"
             result = {
-                "balance": balance_readable,
+                "balance": balance["balance"],
                 "price_usd": price_usd,
+                "balance_age_seconds": balance["balance_age_seconds"],
             }
 
-        elif func_name == "get_icp_balance":
-            raw_balance = icp_ledger_canister.icrc1_balance_of({"owner": get_principal_for_sender(ctx), "subaccount": []})
-            e8s_value = unwrap_candid(raw_balance)
-            balance_readable = to_amount("ICP", e8s_value)
-            try:
-                price_usd = await get_crypto_price(ctx, "ICP", float(balance_readable or 0))
-            except Exception:
-                price_usd = "$0.00"
-            result = {
-                "balance": balance_readable,
-                "price_usd": price_usd,
-            }
+        elif func_name == "get_portfolio":
+            result = await _get_portfolio(ctx, wallet_canister, icp_ledger_canister)
 
         elif func_name == "get_bitcoin_address":
+            networks = await _coin_networks(wallet_canister)
+            address = await get_address_for_sender(ctx, "BTC")
             result = {
-                "address": unwrap_candid(wallet_canister.bitcoin_address()),
+                "address": address,
                 "network": (networks.get("bitcoin") if isinstance(networks, dict) else None) or "unknown",
-                "explorer": _explorer_address_url("BTC", (networks or {}).get("bitcoin", ""), unwrap_candid(wallet_canister.bitcoin_address())),
+                "explorer": _explorer_address_url("BTC", (networks or {}).get("bitcoin", ""), address),
             }
         elif func_name == "get_ethereum_address":
+            networks = await _coin_networks(wallet_canister)
+            address = await get_address_for_sender(ctx, "ETH")
             result = {
-                "address": unwrap_candid(wallet_canister.ethereum_address()),
+                "address": address,
                 "network": (networks.get("ethereum") if isinstance(networks, dict) else None) or "unknown",
-                "explorer": _explorer_address_url("ETH", (networks or {}).get("ethereum", ""), unwrap_candid(wallet_canister.ethereum_address())),
+                "explorer": _explorer_address_url("ETH", (networks or {}).get("ethereum", ""), address),
             }
         elif func_name == "get_solana_address":
+            networks = await _coin_networks(wallet_canister)
+            address = await get_address_for_sender(ctx, "SOL")
             result = {
-                "address": unwrap_candid(wallet_canister.solana_address()),
+                "address": address,
                 "network": (networks.get("solana") if isinstance(networks, dict) else None) or "unknown",
-                "explorer": _explorer_address_url("SOL", (networks or {}).get("solana", ""), unwrap_candid(wallet_canister.solana_address())),
+                "explorer": _explorer_address_url("SOL", (networks or {}).get("solana", ""), address),
             }
         elif func_name == "get_icp_address":
+            networks = await _coin_networks(wallet_canister)
             result = {
                 "address": get_principal_for_sender(ctx),
                 "network": (networks.get("icp") if isinstance(networks, dict) else None) or "unknown",
@@ -250,12 +349,17 @@ async def call_endpoint(ctx: Context, func_name: str, args: dict):
             amount_usd = args.get("amount_usd")
             # Convert USD to cents
             amount_cents = int(Decimal(str(amount_usd)) * 100)
+            price_usd = await run_blocking(get_price_usd_number, coin_type, logger=ctx.logger)
+            if not price_usd or price_usd <= 0:
+                raise ValueError(f"Unable to fetch {coin_type.upper()} price")
             order_id = str(uuid4())
-            session = create_checkout_session(
+            session = await create_reserved_checkout(
                 order_id=order_id,
                 coin_type=coin_type,
+                token_amount_smallest=to_smallest(coin_type.upper(), Decimal(str(amount_usd)) / price_usd),
                 amount_minor=amount_cents,
-                destination_address=destination
+                destination_address=destination,
+                sender=getattr(ctx, "sender", None),
             )
             result = {
                 "order_id": order_id,
@@ -267,11 +371,74 @@ async def call_endpoint(ctx: Context, func_name: str, args: dict):
         return result
     except Exception as e:
         raise Exception(f"ICP canister call failed: {str(e)}")
+    finally:
+        if func_name in _SEND_TOOL_COINS:
+            await _invalidate_balances_after_send(ctx, _SEND_TOOL_COINS[func_name], args.get("destinationAddress"))
+
+async def _execute_tool_call(ctx: Context, tool_call: dict, semaphore: asyncio.Semaphore) -> tuple:
+    """Run one non-confirmation tool call. Returns (tool message content, rendered text or None).
 
-async def process_query(query: str, ctx: Context) -> str:
+    Never raises, so one failing tool does not cancel the others gathered with it.
+    """
+    func_name = tool_call["function"]["name"]
+    async with semaphore:
+        try:
+            arguments = json.loads(tool_call["function"]["arguments"])
+            result = await call_endpoint(ctx, func_name, arguments)
+            return json.dumps(result), render_tool_result(func_name, arguments, result)
+        except Exception as e:
+            ctx.logger.error(f"Error executing tool: {str(e)}")
+            error_content = {
+                "error": f"Tool execution failed: {str(e)}",
+                "status": "failed"
+            }
+            return json.dumps(error_content), (render_tool_error(func_name, str(e)) if has_template(func_name) else None)
+
+async def _with_working_notice(awaitable, reply: Reply | None):
+    """Await a possibly slow operation, telling the user it is still running after WORKING_MESSAGE_DELAY."""
+    task = asyncio.ensure_future(awaitable)
+    if reply is not None and WORKING_MESSAGE_DELAY > 0:
+        done, _ = await asyncio.wait({task}, timeout=WORKING_MESSAGE_DELAY)
+        if not done:
+            try:
+                await reply("Working on it… this can take a few seconds.")
+            except Exception:
+                pass
+    return await task
+
+async def _final_answer(ctx: Context, payload: dict, reply: Reply | None) -> str | None:
+    """ASI1's answer for payload. When streamed to the user through reply, returns None."""
+    if reply is not None and ASI1_STREAMING:
+        # Only a stream that never opened is retried; once it has, a retry could repeat the answer
+        if await stream_reply(payload, reply):
+            return None
+        ctx.logger.info("[stream] falling back to a blocking request")
+    response = await ahttp_post(
+        f"{ASI1_BASE_URL}/chat/completions",
+        headers=ASI1_HEADERS,
+        json=payload
+    )
+    response.raise_for_status()
+    return response.json()["choices"][0]["message"]["content"]
+
+async def process_query(query: str, ctx: Context, reply: Reply | None = None) -> str | None:
+    """Answer one user message.
+
+    With reply (an async callable sending one text message to the user), progress
+    notices and streamed answers are sent through it and None is returned once the
+    answer has been delivered that way.
+    """
     try:
         # Short-circuit: handle pending transfer confirmation flow first
-        pending = _get_pending_transfer_for_sender(ctx)
+        pending = get_pending_transfer(ctx.storage, getattr(ctx, "sender", None))
+        if pending and pending.get("expired"):
+            # Never execute a confirmation older than the TTL
+            if (query or "").strip().lower() == "yes":
+                return (
+                    "Your confirmation request has expired and was not executed.\n"
+                    "Please make the request again."
+                )
+            pending = None
         if pending:
             user_answer = (query or "").strip().lower()
             if user_answer == "yes":
@@ -281,16 +448,9 @@ async def process_query(query: str, ctx: Context) -> str:
                         normalized = pending.get("args", {})
                         coin_type = (normalized.get("coin_type") or "").lower()
                         token_amount = normalized.get("amount")
-                        # Derive destination address from user's own wallet
-                        wallet_canister = make_canister("wallet", get_private_key_for_sender(ctx))
-                        if coin_type.upper() == "BTC":
-                            destination = unwrap_candid(wallet_canister.bitcoin_address())
-                        elif coin_type.upper() == "ETH":
-                            destination = unwrap_candid(wallet_canister.ethereum_address())
-                        elif coin_type.upper() == "SOL":
-                            destination = unwrap_candid(wallet_canister.solana_address())
-                        elif coin_type.upper() == "ICP":
-                            destination = get_principal_for_sender(ctx)
+                        # Derive destination address from user's own wallet (cached per sender)
+                        if coin_type.upper() in ("BTC", "ETH", "SOL", "ICP"):
+                            destination = await get_address_for_sender(ctx, coin_type.upper())
                         else:
                             destination = ""
 
@@ -299,25 +459,29 @@ async def process_query(query: str, ctx: Context) -> str:
                         usd_value = Decimal(str(price_str).replace("$", "")) if isinstance(price_str, str) else Decimal(0)
                         amount_cents = int(usd_value * 100)
                         order_id = str(uuid4())
-                        session = create_checkout_session(
-                            order_id=order_id,
-                            coin_type=coin_type,
-                            amount_minor=amount_cents,
-                            destination_address=destination,
-                        )
-                        checkout_url = session.get("url")
-                        result_text = (
-                            "Payment link has been created.\n"
-                            f"Order ID: {order_id}\n"
-                            f"Pay here: {checkout_url}\n"
-                            "Note: the payment link will expire in 5 minutes."
-                        )
+                        try:
+                            # Holds the inventory atomically; concurrent buyers cannot oversell
+                            session = await _with_working_notice(create_reserved_checkout(
+                                order_id=order_id,
+                                coin_type=coin_type,
+                                token_amount_smallest=to_smallest(coin_type.upper(), Decimal(str(token_amount))),
+                                amount_minor=amount_cents,
+                                destination_address=destination,
+                                sender=getattr(ctx, "sender", None),
+                            ), reply)
+                        except InsufficientInventoryError as e:
+                            _clear_pending_transfer_for_sender(ctx)
+                            return _insufficient_inventory_text(coin_type.upper(), token_amount, e.available)
+                        result_text = render_checkout(order_id, session.get("url"))
                     else:
-                        result = await call_endpoint(ctx, pending["func_name"], pending["args"])
+                        result = await _with_working_notice(call_endpoint(ctx, pending["func_name"], pending["args"]), reply)
 
                     _clear_pending_transfer_for_sender(ctx)
                     if pending.get("func_name") == "buy_crypto":
                         return result_text
+                    transfer_text = render_tool_result(pending["func_name"], pending["args"], result)
+                    if transfer_text is not None and pending["func_name"] not in LLM_FORMATTED_TOOLS:
+                        return transfer_text
                     else:
                         # Forward raw result JSON to ASI1 for nicer final formatting
                         try:
@@ -331,14 +495,7 @@ async def process_query(query: str, ctx: Context) -> str:
                                 "temperature": 0.3,
                                 "max_tokens": 256,
                             }
-                            formatting_response = requests.post(
-                                f"{ASI1_BASE_URL}/chat/completions",
-                                headers=ASI1_HEADERS,
-                                json=formatting_payload,
-                            )
-                            formatting_response.raise_for_status()
-                            formatting_json = formatting_response.json()
-                            return formatting_json["choices"][0]["message"]["content"]
+                            return await _final_answer(ctx, formatting_payload, reply)
                         except Exception:
                             return json.dumps(result)
                 except Exception as e:
@@ -352,40 +509,45 @@ async def process_query(query: str, ctx: Context) -> str:
         if is_greeting(query or ""):
             return help_message
 
-        # Step 1: Initial call to ASI1 with user query and tool
         user_message = {
             "role": "user",
             "content": query
         }
-        payload = {
-            "model": "asi1-mini",
-            "messages": [user_message],
-            "tools": tools,
-            "temperature": 0.2,
-            "max_tokens": 1024
-        }
-        response = requests.post(
-            f"{ASI1_BASE_URL}/chat/completions",
-            headers=ASI1_HEADERS,
-            json=payload
-        )
-        response.raise_for_status()
-        response_json = response.json()
 
-        ctx.logger.info(f"Response: {response_json}")
+        # Step 1a: Common unambiguous commands are parsed locally, skipping the tool-selection call;
+        # otherwise reuse the model's earlier choice for the same query shape
+        tool_calls, route = (fast_tool_calls(query), "intent") if INTENT_FAST_PATH else (None, None)
+        if not tool_calls:
+            tool_calls, route = cached_tool_calls(query), "routing_cache"
+        if tool_calls:
+            ctx.logger.info(f"[{route}] tools: {[c['function']['name'] for c in tool_calls]}")
+            messages_history = [user_message, {"role": "assistant", "content": "", "tool_calls": tool_calls}]
+        else:
+            # Step 1b: Initial call to ASI1 with user query and the tools relevant to it
+            subset = select_tools(query)
+            response_json = await _request_tool_selection(user_message, subset)
+            if subset.pruned and not response_json["choices"][0]["message"].get("tool_calls"):
+                # The pruned list may have missed the right tool; ask once more with all of them
+                record_full_retry()
+                response_json = await _request_tool_selection(user_message, full_tool_set())
 
-        # Step 2: Parse tool calls from response
-        tool_calls = response_json["choices"][0]["message"].get("tool_calls", [])
-        messages_history = [user_message, response_json["choices"][0]["message"]]
+            ctx.logger.info(f"Response: {response_json}")
+
+            # Step 2: Parse tool calls from response
+            tool_calls = response_json["choices"][0]["message"].get("tool_calls", [])
+            messages_history = [user_message, response_json["choices"][0]["message"]]
+            remember_tool_calls(query, tool_calls)
 
         if not tool_calls:
             return welcome_message
 
-        # Step 3: Intercept transfer tools for confirmation; otherwise execute tools
+        # Price every asset the balance tools will value in one round trip
+        await _prefetch_prices_for_tools(ctx, tool_calls)
+
+        # Step 3: Intercept transfer tools for confirmation; the first one is answered on its own
         for tool_call in tool_calls:
             func_name = tool_call["function"]["name"]
             arguments = json.loads(tool_call["function"]["arguments"])
-            tool_call_id = tool_call["id"]
 
             is_send = func_name in {"send_solana", "send_ethereum", "send_bitcoin", "send_icp"}
             is_buy = func_name in {"buy_crypto", "create_stripe_checkout"}
@@ -431,7 +593,7 @@ async def process_query(query: str, ctx: Context) -> str:
                 if (token_amount is None or token_amount == "") and normalized_args.get("amount_usd") is not None:
                     try:
                         usd_num = Decimal(str(normalized_args.get("amount_usd")))
-                        price_num = get_price_usd_number(coin_type.lower())
+                        price_num = await run_blocking(get_price_usd_number, coin_type.lower())
                         if price_num and price_num > 0:
                             token_amount = (usd_num / price_num)
                             ctx.logger.info(f"[buy_check] derived token_amount from USD: usd={usd_num} price={price_num} -> token_amount={token_amount}")
@@ -455,21 +617,9 @@ async def process_query(query: str, ctx: Context) -> str:
                 ctx.logger.info(f"[buy_check] coin_type={coin_type}")
 
                 if desired_e_smallest is not None and desired_e_smallest > 0:
-                    available_smallest = 0
+                    # Local ledger: unreserved inventory, no canister round trip
                     try:
-                        wallet_canister = make_canister("wallet", get_private_key_for_sender(ctx))
-                        balances_raw = wallet_canister.canister_wallet_balance()
-                        balances = unwrap_candid(balances_raw) or {}
-                        ctx.logger.info(f"[buy_check] balances={balances}")
-                        if coin_type == "BTC":
-                            available_smallest = int(balances.get("bitcoin", 0))
-                        elif coin_type == "ETH":
-                            # ethereum balance stored as string (wei)
-                            available_smallest = int(balances.get("ethereum", "0") or 0)
-                        elif coin_type == "SOL":
-                            available_smallest = int(balances.get("solana", 0))
-                        elif coin_type == "ICP":
-                            available_smallest = int(balances.get("icp", 0))
+                        available_smallest = await available_inventory(coin_type)
                         ctx.logger.info(f"[buy_check] available_smallest={available_smallest}")
                     except Exception:
                         # Treat unknown balance as zero to be safe
@@ -477,26 +627,14 @@ async def process_query(query: str, ctx: Context) -> str:
 
                     if desired_e_smallest > available_smallest:
                         ctx.logger.info(f"[buy_check] insufficient: desired={desired_e_smallest} available={available_smallest}")
-                        return (
-                            "Sorry, the canister balance is not sufficient to fulfill your purchase.\n"
-                            f"- Asset: {coin_type}\n"
-                            f"- Requested: {token_amount} {coin_type}\n"
-                            f"- Available: {to_amount(coin_type, available_smallest)} {coin_type}\n"
-                            "Please reduce the amount or try another asset."
-                        )
+                        return _insufficient_inventory_text(coin_type, token_amount, available_smallest)
 
                 _set_pending_transfer_for_sender(ctx, {"func_name": "buy_crypto", "args": normalized_args})
 
                 # Derive user's own wallet address for the asset
                 try:
-                    if coin_type == "BTC":
-                        destination = unwrap_candid(wallet_canister.bitcoin_address())
-                    elif coin_type == "ETH":
-                        destination = unwrap_candid(wallet_canister.ethereum_address())
-                    elif coin_type == "SOL":
-                        destination = unwrap_candid(wallet_canister.solana_address())
-                    elif coin_type == "ICP":
-                        destination = get_principal_for_sender(ctx)
+                    if coin_type in ("BTC", "ETH", "SOL", "ICP"):
+                        destination = await get_address_for_sender(ctx, coin_type)
                     else:
                         destination = "-"
                 except Exception:
@@ -520,75 +658,35 @@ async def process_query(query: str, ctx: Context) -> str:
                 )
                 return confirmation_text
 
-            # Non-transfer tool: execute immediately
-            try:
-                if func_name == "buy_crypto" and _get_pending_transfer_for_sender(ctx):
-                    # If user confirmed "yes", create the checkout session now
-                    # Convert token amount to USD cents using price utility
-                    coin_type = (arguments.get("coinType") or arguments.get("coin_type") or "").lower()
-                    token_amount = arguments.get("amount")
-                    # Derive destination address from user's own wallet
-                    wallet_canister = make_canister("wallet", get_private_key_for_sender(ctx))
-                    if coin_type.upper() == "BTC":
-                        destination = unwrap_candid(wallet_canister.bitcoin_address())
-                    elif coin_type.upper() == "ETH":
-                        destination = unwrap_candid(wallet_canister.ethereum_address())
-                    elif coin_type.upper() == "SOL":
-                        destination = unwrap_candid(wallet_canister.solana_address())
-                    elif coin_type.upper() == "ICP":
-                        destination = get_principal_for_sender(ctx)
-                    else:
-                        destination = ""
-                    # Estimate USD via get_crypto_price (string like "$123.45"). Fallback handled server-side.
-                    price_str = await get_crypto_price(ctx, coin_type.upper(), float(token_amount))
-                    usd_value = Decimal(str(price_str).replace("$", "")) if isinstance(price_str, str) else Decimal(0)
-                    amount_cents = int(usd_value * 100)
-                    order_id = str(uuid4())
-                    session = create_checkout_session(
-                        order_id=order_id,
-                        coin_type=coin_type,
-                        amount_minor=amount_cents,
-                        destination_address=destination,
-                    )
-                    result = {
-                        "order_id": order_id,
-                        "checkout_url": session.get("url"),
-                    }
-                else:
-                    result = await call_endpoint(ctx, func_name, arguments)
-                    content_to_send = json.dumps(result)
-            except Exception as e:
-                ctx.logger.error(f"Error executing tool: {str(e)}")
-                error_content = {
-                    "error": f"Tool execution failed: {str(e)}",
-                    "status": "failed"
-                }
-                content_to_send = json.dumps(error_content)
 
-            tool_result_message = {
+        # Step 3b: Execute the remaining tools concurrently; results keep the tool_call order
+        semaphore = asyncio.Semaphore(TOOL_CALL_CONCURRENCY)
+        outcomes = await _with_working_notice(
+            asyncio.gather(*(_execute_tool_call(ctx, tool_call, semaphore) for tool_call in tool_calls)),
+            reply,
+        )
+        rendered = []
+        for tool_call, (content_to_send, text) in zip(tool_calls, outcomes):
+            messages_history.append({
                 "role": "tool",
-                "tool_call_id": tool_call_id,
+                "tool_call_id": tool_call["id"],
                 "content": content_to_send
-            }
-            messages_history.append(tool_result_message)
+            })
+            rendered.append(text)
 
-        # Step 4: Send results back to ASI1 for final answer
+        # Step 4a: Structured results are rendered locally unless a tool opted into LLM formatting
+        tool_names = {tool_call["function"]["name"] for tool_call in tool_calls}
+        if all(text is not None for text in rendered) and not (tool_names & LLM_FORMATTED_TOOLS):
+            return "\n\n".join(rendered)
+
+        # Step 4b: Send results back to ASI1 for final answer (streamed to the user when possible)
         final_payload = {
             "model": "asi1-mini",
             "messages": messages_history,
             "temperature": 0.7,
             "max_tokens": 1024
         }
-        final_response = requests.post(
-            f"{ASI1_BASE_URL}/chat/completions",
-            headers=ASI1_HEADERS,
-            json=final_payload
-        )
-        final_response.raise_for_status()
-        final_response_json = final_response.json()
-
-        # Step 5: Return the model's final answer
-        return final_response_json["choices"][0]["message"]["content"]
+        return await _final_answer(ctx, final_payload, reply)
 
     except Exception as e:
         ctx.logger.error(f"Error processing query: {str(e)}")
@@ -598,53 +696,49 @@ chat_proto = Protocol(spec=chat_protocol_spec)
 
 @chat_proto.on_message(model=ChatMessage)
 async def handle_chat_message(ctx: Context, sender: str, msg: ChatMessage):
-    try:
-        ctx.sender = sender
-
-        # send the acknowledgement for receiving the message
-        ack = ChatAcknowledgement(
+    ctx.sender = sender
+
+    # send the acknowledgement for receiving the message
+    ack = ChatAcknowledgement(
+        timestamp=datetime.now(timezone.utc),
+        acknowledged_msg_id=msg.msg_id
+    )
+    await ctx.send(sender, ack)
+
+    # The work runs on the dispatcher: in order per sender, other senders in parallel
+    if not submit(sender, lambda: _process_chat_message(ctx, sender, msg)):
+        ctx.logger.info(f"[dispatcher] queue full, asking {sender} to retry")
+        await ctx.send(sender, ChatMessage(
             timestamp=datetime.now(timezone.utc),
-            acknowledged_msg_id=msg.msg_id
-        )
-        await ctx.send(sender, ack)
+            msg_id=uuid4(),
+            content=[TextContent(type="text", text=busy_message)]
+        ))
 
+async def _process_chat_message(ctx: Context, sender: str, msg: ChatMessage):
+    try:
         for item in msg.content:
             if isinstance(item, StartSessionContent):
                 ctx.logger.info(f"Got a start session message from {sender}")
 
-                principal, priv_b64, pub_b64 = generate_ed25519_identity()
-
-                identities = ctx.storage.get("identity") or []
-                if not isinstance(identities, list):
-                    identities = [identities]
-
-                already_exists = any(
-                    isinstance(item, dict) and item.get("sender") == sender
-                    for item in identities
-                )
-
-                if already_exists:
+                _, created = ensure_identity(ctx.storage, sender)
+                if not created:
                     ctx.logger.info(f"Identity already exists for {sender}")
-                    continue
-
-                identities.append({
-                    "principal": principal,
-                    "private_key": priv_b64,
-                    "public_key": pub_b64,
-                    "sender": sender
-                })
-                ctx.storage.set("identity", identities)
+                prefetch_addresses(ctx)
 
                 continue
             elif isinstance(item, TextContent):
-                response_text = await process_query(item.text, ctx)
+                async def reply(text: str) -> None:
+                    await ctx.send(sender, ChatMessage(
+                        timestamp=datetime.now(timezone.utc),
+                        msg_id=uuid4(),
+                        content=[TextContent(type="text", text=text)]
+                    ))
+
+                response_text = await process_query(item.text, ctx, reply)
                 ctx.logger.info(f"Response text: {response_text}")
-                response = ChatMessage(
-                    timestamp=datetime.now(timezone.utc),
-                    msg_id=uuid4(),
-                    content=[TextContent(type="text", text=response_text)]
-                )
-                await ctx.send(sender, response)
+                # None: the answer was already streamed to the sender
+                if response_text is not None:
+                    await reply(response_text)
             else:
                 ctx.logger.info(f"Got unexpected content from {sender}")
     except Exception as e:
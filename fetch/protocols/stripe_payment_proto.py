@@ -1,4 +1,3 @@
-import requests
 import uuid
 from decimal import Decimal
 
@@ -6,16 +5,30 @@ from uagents import Protocol, Context
 
 from messages.create_payment_message import CreatePaymentMessage, CreatePaymentResponse
 from config.settings import STRIPE_API_URL, STRIPE_API_KEY, STRIPE_WEBHOOK_URL
-from utils.canister import make_canister
 from utils.coin import to_amount, to_smallest
 from utils.pricing import get_price_usd, get_price_usd_number
 from utils.identity import generate_ed25519_identity
 from utils.candid import unwrap_candid
 from utils.context import get_private_key_for_sender, get_principal_for_sender
-from utils.stripe import create_checkout_session
+from utils.inventory import available_inventory, create_reserved_checkout, InsufficientInventoryError
+from utils.http_client import run_blocking
 
 stripe_payment_proto = Protocol(name="Stripe Payment Protocol")
 
+def _insufficient_inventory_response(msg: CreatePaymentMessage, coin_type: str, token_amount, available_smallest: int) -> CreatePaymentResponse:
+    return CreatePaymentResponse(
+        message=(
+            "Sorry, the canister balance is not sufficient to fulfill your purchase.\n"
+            f"- Asset: {coin_type}\n"
+            f"- Requested: {token_amount} {coin_type}\n"
+            f"- Available: {to_amount(coin_type, max(available_smallest, 0))} {coin_type}\n"
+            "Please reduce the amount or try another asset."
+        ),
+        order_id=msg.order_id,
+        payment_url="",
+        success=False,
+    )
+
 @stripe_payment_proto.on_message(model=CreatePaymentMessage)
 async def handle_create_payment_message(ctx: Context, sender: str, msg: CreatePaymentMessage):
     ctx.logger.info(
@@ -64,21 +77,9 @@ async def handle_create_payment_message(ctx: Context, sender: str, msg: CreatePa
         ctx.logger.info(f"[buy_check] coin_type={coin_type}")
 
         if desired_e_smallest is not None and desired_e_smallest > 0:
-            available_smallest = 0
+            # Local ledger: unreserved inventory, no canister round trip
             try:
-                wallet_canister = make_canister("wallet", get_private_key_for_sender(ctx))
-                balances_raw = wallet_canister.canister_wallet_balance()
-                balances = unwrap_candid(balances_raw) or {}
-                ctx.logger.info(f"[buy_check] balances={balances}")
-                if coin_type == "BTC":
-                    available_smallest = int(balances.get("bitcoin", 0))
-                elif coin_type == "ETH":
-                    # ethereum balance stored as string (wei)
-                    available_smallest = int(balances.get("ethereum", "0") or 0)
-                elif coin_type == "SOL":
-                    available_smallest = int(balances.get("solana", 0))
-                elif coin_type == "ICP":
-                    available_smallest = int(balances.get("icp", 0))
+                available_smallest = await available_inventory(coin_type)
                 ctx.logger.info(f"[buy_check] available_smallest={available_smallest}")
             except Exception:
                 # Treat unknown balance as zero to be safe
@@ -86,25 +87,14 @@ async def handle_create_payment_message(ctx: Context, sender: str, msg: CreatePa
 
             if desired_e_smallest > available_smallest:
                 ctx.logger.info(f"[buy_check] insufficient: desired={desired_e_smallest} available={available_smallest}")
-                return CreatePaymentResponse(
-                    message=(
-                        "Sorry, the canister balance is not sufficient to fulfill your purchase.\n"
-                        f"- Asset: {coin_type}\n"
-                        f"- Requested: {token_amount} {coin_type}\n"
-                        f"- Available: {to_amount(coin_type, available_smallest)} {coin_type}\n"
-                        "Please reduce the amount or try another asset."
-                    ),
-                    order_id=msg.order_id,
-                    payment_url="",
-                    success=False,
-                )
+                return _insufficient_inventory_response(msg, coin_type, token_amount, available_smallest)
 
         # Estimate USD price for the token amount
         estimated_price_text = "Unavailable"
         amount_cents = 0
         try:
             if token_amount is not None:
-                estimated_price_text = get_price_usd(coin_type, float(token_amount), logger=ctx.logger)
+                estimated_price_text = await run_blocking(get_price_usd, coin_type, float(token_amount), logger=ctx.logger)
                 # Convert USD string to cents
                 usd_value = Decimal(str(estimated_price_text).replace("$", "")) if isinstance(estimated_price_text, str) else Decimal(0)
                 amount_cents = int(usd_value * 100)
@@ -125,13 +115,15 @@ async def handle_create_payment_message(ctx: Context, sender: str, msg: CreatePa
                 success=False,
             )
 
-        # Create Stripe checkout session using the utility function
+        # Reserve inventory and create the Stripe checkout session
         try:
-            session = create_checkout_session(
+            session = await create_reserved_checkout(
                 order_id=str(msg.order_id),
                 coin_type=coin_type.lower(),
+                token_amount_smallest=desired_e_smallest or 0,
                 amount_minor=amount_cents,
                 destination_address=msg.target_address,
+                sender=sender,
             )
             
             if session and 'url' in session:
@@ -150,6 +142,9 @@ async def handle_create_payment_message(ctx: Context, sender: str, msg: CreatePa
                     success=False,
                 )
                 
+        except InsufficientInventoryError as e:
+            ctx.logger.info(f"[buy_check] reservation refused: {e}")
+            return _insufficient_inventory_response(msg, coin_type, token_amount, e.available)
         except Exception as e:
             ctx.logger.error(f"Error creating Stripe checkout session: {e}")
             return CreatePaymentResponse(
@@ -0,0 +1,114 @@
+import asyncio
+from typing import Optional
+
+from uagents import Context
+
+from config.settings import ADDRESS_CACHE_SIZE, ADDRESS_CACHE_TTL
+from utils.cache import TTLCache, FRESH
+from utils.canister import make_async_canister
+from utils.candid import unwrap_candid
+from utils.context import get_private_key_for_sender, get_principal_for_sender
+from utils.singleflight import SingleFlight
+
+
+# coin symbol -> field of the wallet canister's Addresses record
+_CHAIN_FIELDS = {"BTC": "bitcoin", "ETH": "ethereum", "SOL": "solana"}
+
+# sender -> {"principal", "bitcoin", "ethereum", "solana", "icp"}, in front of ctx.storage
+# (which keeps every sender's addresses); bounded so idle senders fall out of memory
+_memory = TTLCache(ttl=ADDRESS_CACHE_TTL, max_size=ADDRESS_CACHE_SIZE, name="addresses")
+
+_address_flight = SingleFlight("addresses")
+
+# Keep references so background prefetch tasks are not garbage collected mid-flight
+_prefetch_tasks = set()
+
+
+def _storage_key(sender: str) -> str:
+    return f"addresses:{sender}"
+
+
+def _cached(storage, sender: str, principal: str) -> Optional[dict]:
+    entry, state = _memory.get(sender)
+    if state != FRESH:
+        try:
+            entry = storage.get(_storage_key(sender))
+        except Exception:
+            entry = None
+        if isinstance(entry, dict):
+            _memory.set(sender, entry)
+    # Addresses are derived from the identity: a different principal means a stale entry
+    if isinstance(entry, dict) and entry.get("principal") == principal:
+        return entry
+    return None
+
+
+async def _fetch_addresses(private_key: str, principal: str) -> dict:
+    wallet_canister = make_async_canister("wallet", private_key)
+    try:
+        # One update call derives every chain address for the calling identity
+        addresses = unwrap_candid(await wallet_canister.get_addresses(principal)) or {}
+    except Exception as e:
+        print(f"[addresses] get_addresses failed, falling back to per-chain calls: {e}")
+        values = await asyncio.gather(*(getattr(wallet_canister, f"{field}_address")() for field in _CHAIN_FIELDS.values()))
+        addresses = {field: unwrap_candid(value) for field, value in zip(_CHAIN_FIELDS.values(), values)}
+    entry = {field: addresses.get(field) for field in _CHAIN_FIELDS.values()}
+    if not all(entry.values()):
+        raise Exception(f"Wallet canister returned incomplete addresses: {entry}")
+    # The record's icp field is the canister's own account; the user's ICP address is their principal
+    entry["icp"] = principal
+    entry["principal"] = principal
+    return entry
+
+
+async def _load_addresses(storage, sender: str, private_key: str, principal: str) -> dict:
+    entry = _cached(storage, sender, principal)
+    if entry is not None:
+        return entry
+    entry = await _address_flight.do_async(sender, _fetch_addresses, private_key, principal)
+    _memory.set(sender, entry)
+    storage.set(_storage_key(sender), entry)
+    return entry
+
+
+async def get_addresses_for_sender(ctx: Context) -> dict:
+    """All wallet addresses of the sender, fetched from the canister at most once per identity."""
+    principal = get_principal_for_sender(ctx)
+    private_key = get_private_key_for_sender(ctx)
+    if not principal or not private_key:
+        raise Exception("No identity found for sender")
+    return await _load_addresses(ctx.storage, ctx.sender, private_key, principal)
+
+
+async def get_address_for_sender(ctx: Context, coin: str) -> str:
+    """The sender's address for BTC, ETH, SOL or ICP."""
+    symbol = (coin or "").strip().upper()
+    if symbol == "ICP":
+        return get_principal_for_sender(ctx)
+    if symbol not in _CHAIN_FIELDS:
+        raise ValueError(f"Unsupported coin symbol: {coin}")
+    return (await get_addresses_for_sender(ctx))[_CHAIN_FIELDS[symbol]]
+
+
+def prefetch_addresses(ctx: Context) -> None:
+    """Derive and cache the sender's addresses in the background, if not cached yet."""
+    sender = ctx.sender
+    principal = get_principal_for_sender(ctx)
+    private_key = get_private_key_for_sender(ctx)
+    if not principal or not private_key or _cached(ctx.storage, sender, principal) is not None:
+        return
+
+    async def _run():
+        try:
+            await _load_addresses(ctx.storage, sender, private_key, principal)
+            ctx.logger.info(f"[addresses] Prefetched addresses for {sender}")
+        except Exception as e:
+            ctx.logger.info(f"[addresses] Prefetch failed for {sender}: {e}")
+
+    task = asyncio.ensure_future(_run())
+    _prefetch_tasks.add(task)
+    task.add_done_callback(_prefetch_tasks.discard)
+
+
+def get_address_cache_stats() -> dict:
+    return _memory.stats()
@@ -0,0 +1,134 @@
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from config.settings import BALANCE_CACHE_TTL, BALANCE_CACHE_TTL_OVERRIDES
+from utils.cache import TTLCache, FRESH
+from utils.shared_db import get_connection, register_schema
+from utils.singleflight import SingleFlight
+
+
+# (COIN, address) -> (balance in smallest unit, wall-clock fetch time)
+_balance_cache = TTLCache(ttl=BALANCE_CACHE_TTL, max_size=10000, name="balance")
+_balance_flight = SingleFlight("balance")
+
+# Payout journal shared with webhook.py, which runs in its own process. Every payout replaces
+# the address's row with a new seq (AUTOINCREMENT never reuses or goes back), so readers follow
+# it with a cursor on seq instead of on either process's clock.
+register_schema(
+    "DROP TABLE IF EXISTS balance_invalidations",
+    "CREATE TABLE IF NOT EXISTS payout_journal ("
+    " seq INTEGER PRIMARY KEY AUTOINCREMENT, coin TEXT NOT NULL, address TEXT NOT NULL,"
+    " invalidated_at REAL NOT NULL, UNIQUE (coin, address))",
+)
+
+# When each balance was last invalidated in this process's clock: (COIN, address) -> time.
+# Cache hits and finishing loads check it, so cache hits never touch SQLite. Filled by
+# invalidate_balance / record_payout here and by sync_payout_journal (off the event loop).
+_invalidations: Dict[Tuple[str, str], float] = {}
+_journal_seq = 0
+_journal_lock = threading.Lock()
+
+
+def _balance_ttl(coin: str) -> float:
+    return BALANCE_CACHE_TTL_OVERRIDES.get(coin, BALANCE_CACHE_TTL)
+
+
+def _key(coin: str, address: str) -> Tuple[str, str]:
+    return (coin or "").strip().upper(), (address or "").strip()
+
+
+def sync_payout_journal() -> int:
+    """Pull payouts the webhook recorded since the last call and drop the affected balances.
+
+    Blocking (SQLite); the agent runs it periodically on the I/O pool. Returns the rows applied.
+    """
+    global _journal_seq
+    try:
+        rows = get_connection().execute(
+            "SELECT seq, coin, address FROM payout_journal WHERE seq > ? ORDER BY seq",
+            (_journal_seq,),
+        ).fetchall()
+    except Exception as e:
+        print(f"[BalanceCache] Failed to read payout journal: {e}")
+        return 0
+    # Marked with the time seen here: never earlier than the payout, whatever the webhook's clock says
+    now = time.time()
+    max_ttl = max([BALANCE_CACHE_TTL, *BALANCE_CACHE_TTL_OVERRIDES.values()])
+    with _journal_lock:
+        for seq, coin, address in rows:
+            _invalidations[(coin, address)] = now
+            _journal_seq = max(_journal_seq, seq)
+        # Older marks can no longer be newer than any cached fetch
+        for key in [k for k, at in _invalidations.items() if now - at > max_ttl]:
+            del _invalidations[key]
+    return len(rows)
+
+
+def _is_invalidated(key: Tuple[str, str], fetched_at: float) -> bool:
+    return _invalidations.get(key, 0.0) >= fetched_at
+
+
+def get_cached_balance(coin: str, address: str) -> Optional[Tuple[Any, float]]:
+    """(smallest-unit balance, age in seconds) if a fresh, still-valid entry exists."""
+    key = _key(coin, address)
+    value, state = _balance_cache.get(key)
+    if state != FRESH:
+        return None
+    balance, fetched_at = value
+    # A send or payout recorded after this fetch makes the entry stale
+    if _is_invalidated(key, fetched_at):
+        _balance_cache.invalidate(key)
+        return None
+    return balance, max(0.0, time.time() - fetched_at)
+
+
+def invalidate_balance(coin: str, address: str) -> None:
+    """Drop the cached balance in this process (e.g. after a send from or to the address).
+
+    Also marks the time, so a load that started before the send does not store its result.
+    """
+    key = _key(coin, address)
+    with _journal_lock:
+        _invalidations[key] = time.time()
+    _balance_cache.invalidate(key)
+
+
+def record_payout(coin: str, address: str) -> None:
+    """Invalidate the address's balance for every process sharing the payout journal."""
+    coin, address = _key(coin, address)
+    invalidate_balance(coin, address)
+    try:
+        # REPLACE inserts a fresh row, so the address gets a new, higher seq
+        get_connection().execute(
+            "INSERT OR REPLACE INTO payout_journal (coin, address, invalidated_at) VALUES (?, ?, ?)",
+            (coin, address, time.time()),
+        )
+    except Exception as e:
+        print(f"[BalanceCache] Failed to record payout for {coin} {address}: {e}")
+
+
+async def get_balance(coin: str, address: str, loader: Callable[[], Awaitable[Any]]) -> Tuple[Any, float]:
+    """Cached balance for (coin, address): returns (smallest-unit balance, age in seconds).
+
+    On a miss, loader() queries the canister; concurrent misses share one call.
+    """
+    cached = get_cached_balance(coin, address)
+    if cached is not None:
+        return cached
+    key = _key(coin, address)
+
+    async def _load():
+        fetched_at = time.time()
+        balance = await loader()
+        # A send finished while this was loading: the result may predate it, so do not cache it
+        if not _is_invalidated(key, fetched_at):
+            _balance_cache.set(key, (balance, fetched_at), ttl=_balance_ttl(key[0]))
+        return balance
+
+    balance = await _balance_flight.do_async(key, _load)
+    return balance, 0.0
+
+
+def get_balance_cache_stats() -> dict:
+    return _balance_cache.stats()
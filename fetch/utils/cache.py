@@ -0,0 +1,161 @@
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+FRESH = "fresh"
+STALE = "stale"
+MISS = "miss"
+
+
+class TTLCache:
+    """Thread-safe in-memory cache with per-entry TTL and a stale window.
+
+    - age < ttl: the entry is fresh and served as-is
+    - ttl <= age < ttl + stale_ttl: the entry is stale; it can still be served
+      while a background refresh replaces it
+    - older than that: treated as a miss
+    """
+
+    def __init__(self, ttl: float, stale_ttl: float = 0.0, max_size: Optional[int] = None, name: str = "cache"):
+        self.ttl = float(ttl)
+        self.stale_ttl = float(stale_ttl)
+        self.max_size = max_size
+        self.name = name
+        # key -> (value, stored_at, ttl)
+        self._data: Dict[Hashable, Tuple[Any, float, float]] = {}
+        self._lock = threading.Lock()
+        self._refreshing = set()
+        self._stats = {"hits": 0, "misses": 0, "stale": 0, "refreshes": 0, "refresh_errors": 0, "evictions": 0}
+
+    def _state(self, stored_at: float, ttl: float, now: float) -> str:
+        age = now - stored_at
+        if age < ttl:
+            return FRESH
+        if age < ttl + self.stale_ttl:
+            return STALE
+        return MISS
+
+    def get(self, key: Hashable) -> Tuple[Any, str]:
+        """Return (value, state) where state is one of 'fresh', 'stale' or 'miss'."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None, MISS
+            value, stored_at, ttl = entry
+            state = self._state(stored_at, ttl, now)
+            if state == FRESH:
+                self._stats["hits"] += 1
+            elif state == STALE:
+                self._stats["stale"] += 1
+            else:
+                del self._data[key]
+                self._stats["misses"] += 1
+                return None, MISS
+            return value, state
+
+    def age(self, key: Hashable) -> Optional[float]:
+        """Seconds since the entry was stored, or None when absent."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            return time.monotonic() - entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = (value, time.monotonic(), self.ttl if ttl is None else float(ttl))
+            if self.max_size is not None:
+                while len(self._data) > self.max_size:
+                    # dicts keep insertion order: the first key is the oldest write
+                    del self._data[next(iter(self._data))]
+                    self._stats["evictions"] += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def invalidate_where(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        """Drop every entry for which predicate(key, value) is true. Returns the count."""
+        with self._lock:
+            doomed = [k for k, (v, _, _) in self._data.items() if predicate(k, v)]
+            for k in doomed:
+                del self._data[k]
+            return len(doomed)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def refresh_in_background(self, key: Hashable, loader: Callable[[], Any], ttl: Optional[float] = None) -> bool:
+        """Reload key on a daemon thread unless a refresh for it is already running."""
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            self._stats["refreshes"] += 1
+
+        def _run():
+            try:
+                value = loader()
+                if value is not None:
+                    self.set(key, value, ttl)
+            except Exception:
+                with self._lock:
+                    self._stats["refresh_errors"] += 1
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=_run, name=f"{self.name}-refresh", daemon=True).start()
+        return True
+
+    def refresh_many_in_background(self, keys, loader: Callable[[list], Dict[Hashable, Any]], ttl_for: Optional[Callable[[Hashable], float]] = None) -> bool:
+        """Reload several keys with one loader call on a daemon thread.
+
+        loader receives the keys not already being refreshed and returns a
+        {key: value} mapping; keys missing from the mapping keep their old entry.
+        """
+        with self._lock:
+            pending = [k for k in keys if k not in self._refreshing]
+            if not pending:
+                return False
+            self._refreshing.update(pending)
+            self._stats["refreshes"] += 1
+
+        def _run():
+            try:
+                values = loader(pending) or {}
+                for k, v in values.items():
+                    if v is not None:
+                        self.set(k, v, ttl_for(k) if ttl_for else None)
+            except Exception:
+                with self._lock:
+                    self._stats["refresh_errors"] += 1
+            finally:
+                with self._lock:
+                    self._refreshing.difference_update(pending)
+
+        threading.Thread(target=_run, name=f"{self.name}-refresh", daemon=True).start()
+        return True
+
+    def get_or_load(self, key: Hashable, loader: Callable[[], Any], ttl: Optional[float] = None) -> Any:
+        """Serve fresh values directly, stale values with a background refresh,
+        and load synchronously on a miss. None results are not cached."""
+        value, state = self.get(key)
+        if state == FRESH:
+            return value
+        if state == STALE:
+            self.refresh_in_background(key, loader, ttl)
+            return value
+        value = loader()
+        if value is not None:
+            self.set(key, value, ttl)
+        return value
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, "size": len(self._data)}
@@ -1,3 +1,7 @@
+class CanisterError(Exception):
+    """The canister answered with an Err result: the call ran and definitely failed."""
+
+
 def unwrap_candid(value):
     v = value
     # Unwrap list/tuple satu elemen berulang kali
@@ -8,7 +12,7 @@ def unwrap_candid(value):
         if "Ok" in v:
             return v["Ok"]
         if "Err" in v:
-            raise Exception(f"Canister returned error: {v['Err']}")
+            raise CanisterError(f"Canister returned error: {v['Err']}")
     return v
 
 
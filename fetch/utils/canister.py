@@ -1,15 +1,37 @@
 import os
+import asyncio
 import base64
+import functools
+import hashlib
 import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Tuple
 from dotenv import load_dotenv
-from ic.canister import Canister
+from ic.canister import Canister, CaniterMethod, CaniterMethodAsync
 from ic.client import Client
 from ic.identity import Identity
 from ic.agent import Agent as ICAgent
 from ic.principal import Principal
+from ic.system_state import canister_module_hash
 from cryptography.hazmat.primitives.serialization import load_pem_private_key, load_der_private_key, Encoding, PrivateFormat, NoEncryption
 from cryptography.hazmat.primitives.asymmetric import ed25519, ec
 
+from config.settings import (
+    CANISTER_CACHE_SIZE,
+    CANISTER_MAX_WORKERS,
+    CANISTER_CONCURRENCY,
+    CANISTER_CALL_TIMEOUT,
+    CANISTER_METADATA_TTL,
+    CANISTER_MODULE_HASH_CHECK_INTERVAL,
+    IDENTITY_CACHE_SIZE,
+    IDENTITY_CACHE_IDLE_TTL,
+)
+from utils.cache import TTLCache, FRESH
+from utils.singleflight import SingleFlight
+
 load_dotenv()
 
 BASE_URL = "http://localhost:4943" if os.getenv("DFX_NETWORK") == "local" else "https://ic0.app"
@@ -77,20 +99,286 @@ def _normalize_privkey_to_hex(priv_key: str) -> str:
     raise ValueError("Unsupported private key format. Provide hex, PEM, or base64 PKCS8 body.")
 
 
-def make_canister(canister_name: str, priv_key: str) -> Canister:
-    try:
-        priv_hex = _normalize_privkey_to_hex(priv_key)
+# Level 1: one parsed Candid interface per canister name (parsed once per process)
+_templates: Dict[str, Canister] = {}
+_templates_lock = threading.Lock()
+
+# Level 2: LRU of ready Canister objects keyed by (canister name, identity digest)
+_canisters: "OrderedDict[Tuple[str, str], Canister]" = OrderedDict()
+_canisters_lock = threading.Lock()
+_canister_stats = {"hits": 0, "misses": 0, "evictions": 0, "candid_parses": 0}
+
+# Decoded identities: key digest -> [ICAgent, last used], least recently used first.
+# Memory only; an identity idle for IDENTITY_CACHE_IDLE_TTL is dropped with its canisters.
+# Guarded by _canisters_lock.
+_identities: "OrderedDict[str, list]" = OrderedDict()
+_identity_stats = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+
+def _build_canister(canister_name: str, priv_key: str) -> Canister:
+    """Uncached construction: read + parse Candid, decode key, build agent."""
+    priv_hex = _normalize_privkey_to_hex(priv_key)
+
+    ic_identity = Identity(privkey=priv_hex)
+    ic_agent = ICAgent(ic_identity, client)
+
+    canister_id = os.getenv(f"CANISTER_ID_{canister_name.upper()}")
+    candid = open(_get_candid_path(canister_name)).read()
+    return Canister(agent=ic_agent, canister_id=canister_id, candid=candid)
+
+
+def _candid_template(canister_name: str) -> Canister:
+    """Parse the canister's Candid once, bound to an anonymous agent."""
+    template = _templates.get(canister_name)
+    if template is not None:
+        return template
+    with _templates_lock:
+        template = _templates.get(canister_name)
+        if template is None:
+            canister_id = os.getenv(f"CANISTER_ID_{canister_name.upper()}")
+            with open(_get_candid_path(canister_name)) as f:
+                candid = f.read()
+            anonymous_agent = ICAgent(Identity(anonymous=True), client)
+            template = Canister(agent=anonymous_agent, canister_id=canister_id, candid=candid)
+            _templates[canister_name] = template
+            _canister_stats["candid_parses"] += 1
+    return template
+
+
+def _bind_canister(template: Canister, agent: ICAgent) -> Canister:
+    """Clone a parsed Canister for another agent without re-parsing its Candid.
+
+    Mirrors what ic.canister.Canister.__init__ does after parsing.
+    """
+    canister = Canister.__new__(Canister)
+    canister.agent = agent
+    canister.canister_id = template.canister_id
+    canister.candid = template.candid
+    canister.actor = template.actor
+    for name, method in template.actor["methods"].items():
+        anno = None if len(method.annotations) == 0 else method.annotations[0]
+        setattr(canister, name, CaniterMethod(agent, template.canister_id, name, method.argTypes, method.retTypes, anno))
+        setattr(canister, name + "_async", CaniterMethodAsync(agent, template.canister_id, name, method.argTypes, method.retTypes, anno))
+    return canister
+
+
+def _key_digest(priv_key: str) -> str:
+    return hashlib.sha256((priv_key or "").strip().encode("utf-8")).hexdigest()
 
-        ic_identity = Identity(privkey=priv_hex)
-        ic_agent = ICAgent(ic_identity, client)
 
-        canister_id = os.getenv(f"CANISTER_ID_{canister_name.upper()}")
-        candid = open(_get_candid_path(canister_name)).read()
-        return Canister(agent=ic_agent, canister_id=canister_id, candid=candid)
+def _drop_identity(digest: str) -> None:
+    # Caller holds _canisters_lock
+    _identities.pop(digest, None)
+    for name in list(_templates):
+        _canisters.pop((name, digest), None)
+
+
+def _expire_idle_identities(now: float) -> None:
+    # Caller holds _canisters_lock; entries are in last-used order, so stop at the first fresh one
+    while _identities:
+        digest, (_, last_used) = next(iter(_identities.items()))
+        if now - last_used < IDENTITY_CACHE_IDLE_TTL:
+            break
+        _drop_identity(digest)
+        _identity_stats["expired"] += 1
+
+
+def _touch_identity(digest: str, now: float):
+    # Caller holds _canisters_lock
+    entry = _identities.get(digest)
+    if entry is not None:
+        entry[1] = now
+        _identities.move_to_end(digest)
+    return entry
+
+
+def _agent_for_key(priv_key: str, digest: str) -> ICAgent:
+    """The ICAgent for a private key, decoding the key only on a cache miss."""
+    with _canisters_lock:
+        entry = _touch_identity(digest, time.monotonic())
+        if entry is not None:
+            _identity_stats["hits"] += 1
+            return entry[0]
+        _identity_stats["misses"] += 1
+    ic_agent = ICAgent(Identity(privkey=_normalize_privkey_to_hex(priv_key)), client)
+    with _canisters_lock:
+        entry = _identities.get(digest)
+        if entry is not None:
+            return entry[0]
+        _identities[digest] = [ic_agent, time.monotonic()]
+        while len(_identities) > IDENTITY_CACHE_SIZE:
+            _drop_identity(next(iter(_identities)))
+            _identity_stats["evictions"] += 1
+    return ic_agent
+
+
+def make_canister(canister_name: str, priv_key: str) -> Canister:
+    digest = _key_digest(priv_key)
+    key = (canister_name, digest)
+    with _canisters_lock:
+        now = time.monotonic()
+        _expire_idle_identities(now)
+        canister = _canisters.get(key)
+        if canister is not None:
+            _canisters.move_to_end(key)
+            _touch_identity(digest, now)
+            _canister_stats["hits"] += 1
+            return canister
+        _canister_stats["misses"] += 1
+    try:
+        canister = _bind_canister(_candid_template(canister_name), _agent_for_key(priv_key, digest))
     except Exception as e:
         print("Error making canister", e)
         raise e
+    with _canisters_lock:
+        _canisters[key] = canister
+        _canisters.move_to_end(key)
+        while len(_canisters) > CANISTER_CACHE_SIZE:
+            _canisters.popitem(last=False)
+            _canister_stats["evictions"] += 1
+    return canister
+
+
+def get_canister_cache_stats() -> dict:
+    with _canisters_lock:
+        return {
+            **_canister_stats,
+            "size": len(_canisters),
+            "candid_interfaces": len(_templates),
+            "identities": {**_identity_stats, "size": len(_identities)},
+        }
+
+
+# Identical in-flight read-only canister calls share one round trip
+_canister_flight = SingleFlight("canister")
+
+
+# ------------------------------------------------------------------ async facade
+
+# ic-py calls are blocking HTTP round trips; they run here instead of on the event loop
+_canister_executor = ThreadPoolExecutor(max_workers=CANISTER_MAX_WORKERS, thread_name_prefix="canister")
+_canister_semaphores: Dict[str, asyncio.Semaphore] = {}
 
 
+def _canister_semaphore(canister_name: str) -> asyncio.Semaphore:
+    sem = _canister_semaphores.get(canister_name)
+    if sem is None:
+        sem = asyncio.Semaphore(CANISTER_CONCURRENCY)
+        _canister_semaphores[canister_name] = sem
+    return sem
+
+
+async def call_canister(canister_name: str, method_name: str, fn, *args, timeout: float | None = None):
+    """Run a blocking canister method on the canister pool.
+
+    At most CANISTER_CONCURRENCY calls per canister run at once, and the caller
+    gives up after `timeout` seconds (CANISTER_CALL_TIMEOUT by default). A
+    timed-out update call may still complete on the canister.
+    """
+    timeout = CANISTER_CALL_TIMEOUT if timeout is None else timeout
+    loop = asyncio.get_running_loop()
+    async with _canister_semaphore(canister_name):
+        future = loop.run_in_executor(_canister_executor, functools.partial(fn, *args))
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError(
+                f"Canister call {canister_name}.{method_name} timed out after {timeout:g}s; its outcome is unknown"
+            )
+
+
+class AsyncCanister:
+    """Awaitable view of a Canister: `await wallet.bitcoin_balance(addr)`.
+
+    Every method runs through call_canister (bounded pool, per-canister limit, timeout).
+    """
+
+    def __init__(self, canister_name: str, canister: Canister, timeout: float | None = None):
+        self.canister_name = canister_name
+        self.canister = canister
+        self.canister_id = canister.canister_id
+        self.timeout = timeout
+
+    def __getattr__(self, method_name: str):
+        fn = getattr(self.canister, method_name)
+
+        async def call(*args):
+            return await call_canister(self.canister_name, method_name, fn, *args, timeout=self.timeout)
+
+        return call
+
+
+def make_async_canister(canister_name: str, priv_key: str, timeout: float | None = None) -> AsyncCanister:
+    return AsyncCanister(canister_name, make_canister(canister_name, priv_key), timeout=timeout)
+
+
+async def call_shared_async(canister: AsyncCanister, method: str, *args):
+    """Call a read-only, caller-independent canister method (e.g. coin_network,
+    canister_wallet_balance), coalescing concurrent identical calls into one.
+
+    Only use this for methods whose result does not depend on the caller's identity.
+    """
+    key = (str(canister.canister_id), method, repr(args))
+    return await _canister_flight.do_async(key, getattr(canister, method), *args)
+
+
+# ------------------------------------------------------------------ static metadata
+
+# Caller-independent results that only change when the canister is upgraded
+METADATA_METHODS = {"coin_network", "get_supported_exchanges", "get_model_info"}
+
+_metadata_cache = TTLCache(ttl=CANISTER_METADATA_TTL, name="canister_metadata")
+_module_hashes: Dict[str, str] = {}
+_module_hash_checked_at: Dict[str, float] = {}
+_module_hash_tasks = set()
+
+
+def _read_module_hash(canister: Canister) -> str:
+    return canister_module_hash(canister.agent, str(canister.canister_id))
+
+
+async def _check_module_hash(canister: AsyncCanister) -> None:
+    canister_id = str(canister.canister_id)
+    try:
+        module_hash = await call_canister(canister.canister_name, "module_hash", _read_module_hash, canister.canister)
+    except Exception as e:
+        print(f"[canister] module hash check failed for {canister.canister_name}: {e}")
+        return
+    previous = _module_hashes.get(canister_id)
+    _module_hashes[canister_id] = module_hash
+    if previous is not None and previous != module_hash:
+        dropped = _metadata_cache.invalidate_where(lambda key, _: key[0] == canister_id)
+        print(f"[canister] {canister.canister_name} was upgraded; dropped {dropped} cached metadata entries")
+
+
+def _schedule_module_hash_check(canister: AsyncCanister) -> None:
+    canister_id = str(canister.canister_id)
+    now = time.monotonic()
+    if now - _module_hash_checked_at.get(canister_id, float("-inf")) < CANISTER_MODULE_HASH_CHECK_INTERVAL:
+        return
+    _module_hash_checked_at[canister_id] = now
+    task = asyncio.ensure_future(_check_module_hash(canister))
+    _module_hash_tasks.add(task)
+    task.add_done_callback(_module_hash_tasks.discard)
+
+
+async def get_canister_metadata(canister: AsyncCanister, method: str):
+    """Cached result of a static metadata method (see METADATA_METHODS).
+
+    Loaded on first use, kept for CANISTER_METADATA_TTL, and dropped early when
+    a background check sees the canister's module hash change.
+    """
+    if method not in METADATA_METHODS:
+        raise ValueError(f"{method} is not a cacheable metadata method")
+    _schedule_module_hash_check(canister)
+    key = (str(canister.canister_id), method)
+    value, state = _metadata_cache.get(key)
+    if state == FRESH:
+        return value
+    value = await call_shared_async(canister, method)
+    _metadata_cache.set(key, value)
+    return value
 
 
+def get_canister_metadata_stats() -> dict:
+    return _metadata_cache.stats()
@@ -1,22 +1,12 @@
 from uagents import Context
 
+from utils.identity_store import get_identity
+
 
 def get_private_key_for_sender(ctx: Context):
-    identities = ctx.storage.get("identity") or []
-    if not isinstance(identities, list):
-        identities = [identities]
-    for item in identities:
-        if isinstance(item, dict) and item.get("sender") == ctx.sender:
-            return item.get("private_key")
-    return None
+    identity = get_identity(ctx.storage, ctx.sender)
+    return identity.get("private_key") if identity else None
 
 def get_principal_for_sender(ctx: Context):
-    identities = ctx.storage.get("identity") or []
-    if not isinstance(identities, list):
-        identities = [identities]
-    for item in identities:
-        if isinstance(item, dict) and item.get("sender") == ctx.sender:
-            return item.get("principal")
-    return None
-
-
+    identity = get_identity(ctx.storage, ctx.sender)
+    return identity.get("principal") if identity else None
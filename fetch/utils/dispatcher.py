@@ -0,0 +1,95 @@
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from config.settings import CHAT_WORKERS, CHAT_SENDER_QUEUE_LIMIT, CHAT_QUEUE_LIMIT
+
+
+# Chat work queue: messages of one sender run strictly in arrival order, different senders run
+# in parallel on CHAT_WORKERS worker tasks. A worker takes one job from a ready sender and puts
+# the sender back at the end of the ready queue if it has more, so a chatty sender cannot starve
+# the others. Only touched from the agent's event loop, so no locking.
+
+Job = Callable[[], Awaitable[None]]
+
+_queues: Dict[str, Deque[Tuple[float, Job]]] = {}
+_scheduled: Set[str] = set()  # senders waiting in _ready or being served
+_ready: Optional[asyncio.Queue] = None
+_workers: List[asyncio.Task] = []
+_stats = {
+    "submitted": 0,
+    "rejected": 0,
+    "completed": 0,
+    "failed": 0,
+    "queued": 0,
+    "running": 0,
+    "max_queued": 0,
+    "wait_ms_total": 0.0,
+}
+
+
+def _start_workers() -> None:
+    global _ready
+    _ready = asyncio.Queue()
+    for i in range(max(1, CHAT_WORKERS)):
+        _workers.append(asyncio.ensure_future(_worker(i)))
+
+
+async def _worker(index: int) -> None:
+    while True:
+        sender = await _ready.get()
+        queued_at, job = _queues[sender].popleft()
+        _stats["queued"] -= 1
+        _stats["running"] += 1
+        _stats["wait_ms_total"] += (time.monotonic() - queued_at) * 1000
+        try:
+            await job()
+            _stats["completed"] += 1
+        except asyncio.CancelledError:
+            # Only a cancellation of this worker stops it; a job cancelled from inside
+            # (e.g. an awaited task was cancelled) must not shrink the pool
+            if asyncio.current_task().cancelling():
+                raise
+            _stats["failed"] += 1
+            print(f"[Dispatcher] worker {index}: job for {sender} was cancelled")
+        except Exception as e:
+            _stats["failed"] += 1
+            print(f"[Dispatcher] worker {index}: job for {sender} failed: {e}")
+        finally:
+            _stats["running"] -= 1
+            if _queues[sender]:
+                _ready.put_nowait(sender)
+            else:
+                del _queues[sender]
+                _scheduled.discard(sender)
+
+
+def submit(sender: str, job: Job) -> bool:
+    """Queue job behind the sender's earlier messages. False when the queue is full (tell the sender to retry)."""
+    if not _workers:
+        _start_workers()
+    queue = _queues.get(sender)
+    if _stats["queued"] >= CHAT_QUEUE_LIMIT or (queue is not None and len(queue) >= CHAT_SENDER_QUEUE_LIMIT):
+        _stats["rejected"] += 1
+        return False
+    if queue is None:
+        queue = _queues[sender] = deque()
+    queue.append((time.monotonic(), job))
+    _stats["submitted"] += 1
+    _stats["queued"] += 1
+    _stats["max_queued"] = max(_stats["max_queued"], _stats["queued"])
+    if sender not in _scheduled:
+        _scheduled.add(sender)
+        _ready.put_nowait(sender)
+    return True
+
+
+def get_dispatcher_stats() -> dict:
+    started = _stats["completed"] + _stats["failed"] + _stats["running"]
+    return {
+        "workers": len(_workers),
+        "senders": len(_queues),
+        **{k: v for k, v in _stats.items() if k != "wait_ms_total"},
+        "avg_wait_ms": round(_stats["wait_ms_total"] / started, 1) if started else None,
+    }
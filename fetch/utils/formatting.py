@@ -0,0 +1,152 @@
+from typing import Callable, Dict, Optional
+
+
+# Local, deterministic renderings of structured tool results, used instead of a
+# second ASI1 round trip. Tools without a template here (e.g. best_market_price)
+# still go through the LLM formatting pass.
+
+NETWORK_NAMES = {
+    "BTC": "Bitcoin",
+    "ETH": "Ethereum",
+    "SOL": "Solana",
+    "ICP": "ICP",
+}
+
+_TOOL_COINS = {
+    "bitcoin": "BTC",
+    "ethereum": "ETH",
+    "solana": "SOL",
+    "icp": "ICP",
+}
+
+
+def _tool_coin(func_name: str) -> str:
+    # get_bitcoin_balance / send_solana / get_icp_address -> coin symbol
+    for chain, coin in _TOOL_COINS.items():
+        if f"_{chain}" in func_name:
+            return coin
+    return ""
+
+
+def _age_note(seconds) -> str:
+    try:
+        seconds = int(seconds)
+    except (TypeError, ValueError):
+        return ""
+    return f" (as of {seconds}s ago)" if seconds >= 5 else ""
+
+
+def _render_help(args: dict, result) -> str:
+    return str(result)
+
+
+def _render_price(args: dict, result) -> str:
+    coin = str(args.get("coin_type") or "").upper()
+    amount = args.get("amount") or 1
+    return f"{amount} {coin} is currently worth about {result}."
+
+
+def _render_balance(func_name: str) -> Callable[[dict, dict], str]:
+    coin = _tool_coin(func_name)
+
+    def render(args: dict, result: dict) -> str:
+        return (
+            f"Your {NETWORK_NAMES[coin]} balance is {result.get('balance')} {coin} "
+            f"(≈ {result.get('price_usd')}){_age_note(result.get('balance_age_seconds'))}."
+        )
+
+    return render
+
+
+def _render_portfolio(args: dict, result: dict) -> str:
+    lines = ["Your portfolio:"]
+    for asset in result.get("assets") or []:
+        coin = asset.get("coin")
+        if asset.get("error") or asset.get("balance") is None:
+            lines.append(f"- {coin}: unavailable right now")
+        else:
+            lines.append(f"- {coin}: {asset['balance']} {coin} (≈ {asset.get('price_usd')})")
+    lines.append(f"Total: {result.get('total_usd')}")
+    return "\n".join(lines)
+
+
+def _render_address(func_name: str) -> Callable[[dict, dict], str]:
+    coin = _tool_coin(func_name)
+
+    def render(args: dict, result: dict) -> str:
+        text = f"Your {NETWORK_NAMES[coin]} address ({result.get('network') or 'unknown'} network):\n{result.get('address')}"
+        if result.get("explorer"):
+            text += f"\nExplorer: {result['explorer']}"
+        return text
+
+    return render
+
+
+def _render_send(func_name: str) -> Callable[[dict, dict], str]:
+    coin = _tool_coin(func_name)
+
+    def render(args: dict, result) -> str:
+        lines = [
+            "Transfer submitted.",
+            f"- Network: {NETWORK_NAMES[coin]}",
+            f"- Amount: {args.get('amount')} {coin}",
+            f"- Destination: {args.get('destinationAddress')}",
+        ]
+        if isinstance(result, dict) and "txid" in result:
+            lines.append(f"- Transaction ID: {result['txid']}")
+        elif isinstance(result, dict) and "block_index" in result:
+            lines.append(f"- Block index: {result['block_index']}")
+        elif coin == "ICP" and isinstance(result, int):
+            lines.append(f"- Block index: {result}")
+        else:
+            lines.append(f"- Result: {result}")
+        return "\n".join(lines)
+
+    return render
+
+
+def render_checkout(order_id, checkout_url) -> str:
+    return (
+        "Payment link has been created.\n"
+        f"Order ID: {order_id}\n"
+        f"Pay here: {checkout_url}\n"
+        "Note: the payment link will expire in 5 minutes."
+    )
+
+
+def _render_checkout(args: dict, result: dict) -> str:
+    return render_checkout(result.get("order_id"), result.get("checkout_url"))
+
+
+TEMPLATES: Dict[str, Callable] = {
+    "help": _render_help,
+    "get_coin_price": _render_price,
+    "get_portfolio": _render_portfolio,
+    "buy_crypto": _render_checkout,
+    "create_stripe_checkout": _render_checkout,
+}
+for _chain in _TOOL_COINS:
+    TEMPLATES[f"get_{_chain}_balance"] = _render_balance(f"get_{_chain}_balance")
+    TEMPLATES[f"get_{_chain}_address"] = _render_address(f"get_{_chain}_address")
+    TEMPLATES[f"send_{_chain}"] = _render_send(f"send_{_chain}")
+
+
+def has_template(func_name: str) -> bool:
+    return func_name in TEMPLATES
+
+
+def render_tool_result(func_name: str, args: dict, result) -> Optional[str]:
+    """The user-facing text for a tool result, or None when the tool has no template."""
+    template = TEMPLATES.get(func_name)
+    if template is None:
+        return None
+    try:
+        return template(args or {}, result)
+    except Exception as e:
+        print(f"[Formatting] {func_name} template failed: {e}")
+        return None
+
+
+def render_tool_error(func_name: str, error: str) -> str:
+    action = func_name.replace("_", " ")
+    return f"Sorry, I couldn't complete '{action}': {error}"
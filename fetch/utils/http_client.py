@@ -0,0 +1,126 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from config.settings import (
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_READ_TIMEOUT,
+    HTTP_RETRIES,
+    HTTP_RETRY_BACKOFF,
+    HTTP_POOL_MAXSIZE,
+    HTTP_MAX_WORKERS,
+)
+
+
+# One keep-alive session per host (ASI1, CoinGecko, CryptoCompare, Stripe, ...)
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+# Bounded pool the async helpers run blocking I/O on, off the agent's event loop
+_executor = ThreadPoolExecutor(max_workers=HTTP_MAX_WORKERS, thread_name_prefix="http")
+
+
+def _build_session() -> requests.Session:
+    # Retries cover connection errors for every method, but status/read retries
+    # only for idempotent methods (urllib3 default), so POSTs are never replayed.
+    retry = Retry(
+        total=HTTP_RETRIES,
+        backoff_factor=HTTP_RETRY_BACKOFF,
+        # 429s are not retried: hammering a rate-limited API only extends the limit
+        status_forcelist=(500, 502, 503, 504),
+        respect_retry_after_header=False,
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=HTTP_POOL_MAXSIZE, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session(url: str) -> requests.Session:
+    """Return the pooled session for the URL's host, creating it on first use."""
+    host = urlsplit(url).netloc.lower()
+    session = _sessions.get(host)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(host)
+            if session is None:
+                session = _build_session()
+                _sessions[host] = session
+    return session
+
+
+def http_request(method: str, url: str, timeout: Any = None, **kwargs) -> requests.Response:
+    """Blocking request on the host's pooled session with default timeouts."""
+    if timeout is None:
+        timeout = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+    return get_session(url).request(method, url, timeout=timeout, **kwargs)
+
+
+def http_get(url: str, **kwargs) -> requests.Response:
+    return http_request("GET", url, **kwargs)
+
+
+def http_post(url: str, **kwargs) -> requests.Response:
+    return http_request("POST", url, **kwargs)
+
+
+async def run_blocking(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking function on the shared I/O pool without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+
+async def ahttp_get(url: str, **kwargs) -> requests.Response:
+    return await run_blocking(http_request, "GET", url, **kwargs)
+
+
+async def ahttp_post(url: str, **kwargs) -> requests.Response:
+    return await run_blocking(http_request, "POST", url, **kwargs)
+
+
+async def ahttp_stream_lines(method: str, url: str, **kwargs) -> AsyncIterator[str]:
+    """Yield the lines of a streamed response body (e.g. SSE) as they arrive.
+
+    The blocking read runs on the shared I/O pool; lines are handed to the
+    event loop through a queue. Stopping early closes the connection.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    stop = threading.Event()
+    done = object()
+
+    def _pump():
+        try:
+            with http_request(method, url, stream=True, **kwargs) as resp:
+                resp.raise_for_status()
+                if resp.encoding is None:
+                    resp.encoding = "utf-8"
+                for line in resp.iter_lines(decode_unicode=True):
+                    if stop.is_set():
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, line)
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, done)
+
+    loop.run_in_executor(_executor, _pump)
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
@@ -67,25 +67,37 @@ def _normalize_privkey_to_hex(priv_key: str) -> str:
         pass
     raise ValueError("Unsupported private key format. Provide hex, PEM, or base64 PKCS8 body.")
 
+# SubjectPublicKeyInfo header for an Ed25519 key; followed by the 32 raw public key bytes
+ED25519_DER_PREFIX = bytes.fromhex("302a300506032b6570032100")
+
+def der_pubkey_from_raw(raw_pubkey: bytes) -> bytes:
+    return ED25519_DER_PREFIX + raw_pubkey
+
 def generate_ed25519_identity():
+    """Return (principal, private key as base64 PKCS8 DER, public key as base64 DER).
+
+    The principal is derived straight from the raw public key; no PEM round
+    trip, ic-py Identity or probe signature.
+    """
     sk = ed25519.Ed25519PrivateKey.generate()
 
-    priv_pem = sk.private_bytes(
-        encoding=serialization.Encoding.PEM,
+    priv_der = sk.private_bytes(
+        encoding=serialization.Encoding.DER,
         format=serialization.PrivateFormat.PKCS8,
         encryption_algorithm=serialization.NoEncryption(),
-    ).decode("utf-8")
-
-    priv_b64 = "".join(l for l in priv_pem.splitlines() if not l.startswith("-----"))
+    )
+    raw_pubkey = sk.public_key().public_bytes(
+        encoding=serialization.Encoding.Raw,
+        format=serialization.PublicFormat.Raw,
+    )
+    der_pubkey = der_pubkey_from_raw(raw_pubkey)
 
-    priv_hex = _normalize_privkey_to_hex(priv_b64)
-    ic_identity = Identity(privkey=priv_hex)
-    der_pubkey, _ = ic_identity.sign(b"probe")
     principal = Principal.self_authenticating(der_pubkey).to_str()
+    priv_b64 = base64.b64encode(priv_der).decode("ascii")
     der_pubkey_b64 = base64.b64encode(der_pubkey).decode("ascii")
 
     return principal, priv_b64, der_pubkey_b64
 
 if __name__ == "__main__":
-    ptxt, priv_pem, priv_b64, der_pub = generate_ed25519_identity()
+    ptxt, priv_b64, der_pub = generate_ed25519_identity()
     print("script principal:", ptxt)
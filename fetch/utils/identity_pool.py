@@ -0,0 +1,70 @@
+import threading
+import time
+from collections import deque
+from typing import Tuple
+
+from config.settings import IDENTITY_POOL_SIZE, IDENTITY_POOL_LOW_WATERMARK
+from utils.identity import generate_ed25519_identity
+
+
+# Ready-made (principal, private_key, public_key) tuples, so a new session only pops one.
+# A daemon thread tops the pool back up to IDENTITY_POOL_SIZE once it drops below the low watermark.
+_pool: deque = deque()
+_refill_needed = threading.Event()
+_lock = threading.Lock()
+_refill_thread = None
+_stats = {"served_from_pool": 0, "generated_inline": 0, "generated_background": 0, "refill_failures": 0}
+
+# Wait after a failed refill (seconds): doubles per consecutive failure up to the cap
+_RETRY_DELAY = 1.0
+_RETRY_DELAY_MAX = 60.0
+
+
+def _refill() -> None:
+    delay = _RETRY_DELAY
+    while True:
+        _refill_needed.wait()
+        try:
+            while len(_pool) < IDENTITY_POOL_SIZE:
+                _pool.append(generate_ed25519_identity())
+                with _lock:
+                    _stats["generated_background"] += 1
+            delay = _RETRY_DELAY
+        except Exception as e:
+            with _lock:
+                _stats["refill_failures"] += 1
+            print(f"[IdentityPool] Refill failed, retrying in {delay:g}s: {e}")
+            time.sleep(delay)
+            delay = min(delay * 2, _RETRY_DELAY_MAX)
+        _refill_needed.clear()
+        if len(_pool) < IDENTITY_POOL_LOW_WATERMARK:
+            _refill_needed.set()
+
+
+def start_identity_pool() -> None:
+    """Start the background refill thread (idempotent); the pool fills up right away."""
+    global _refill_thread
+    with _lock:
+        if _refill_thread is not None or IDENTITY_POOL_SIZE <= 0:
+            return
+        _refill_thread = threading.Thread(target=_refill, name="identity-pool-refill", daemon=True)
+    _refill_thread.start()
+    _refill_needed.set()
+
+
+def take_identity() -> Tuple[str, str, str]:
+    """A fresh (principal, private_key_b64, public_key_b64); from the pool when one is ready."""
+    try:
+        identity = _pool.popleft()
+    except IndexError:
+        identity = None
+    if len(_pool) < IDENTITY_POOL_LOW_WATERMARK and _refill_thread is not None:
+        _refill_needed.set()
+    with _lock:
+        _stats["served_from_pool" if identity else "generated_inline"] += 1
+    return identity or generate_ed25519_identity()
+
+
+def get_identity_pool_stats() -> dict:
+    with _lock:
+        return {**_stats, "ready": len(_pool)}
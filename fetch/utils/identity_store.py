@@ -0,0 +1,119 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from config.settings import IDENTITY_CACHE_SIZE, IDENTITY_CACHE_IDLE_TTL
+from utils.identity_pool import take_identity
+
+
+# One storage key per sender ("identity:<sender>") instead of one list of every identity
+IDENTITY_KEY_PREFIX = "identity:"
+LEGACY_IDENTITY_KEY = "identity"
+
+# Read-through cache: sender -> [identity record, last used]. The records hold private keys, so
+# like the decoded keys in utils/canister.py it is bounded (LRU) and idle entries are dropped.
+_cache: "OrderedDict[str, list]" = OrderedDict()
+_lock = threading.Lock()
+_migrated = set()  # id() of storages already migrated in this process
+# Legacy list by sender, for storages that are not migrated (see migrate_legacy_identities)
+_legacy_index: Dict[int, Dict[str, dict]] = {}
+
+
+def _identity_key(sender: str) -> str:
+    return f"{IDENTITY_KEY_PREFIX}{sender}"
+
+
+def _cache_get(sender: str) -> Optional[dict]:
+    now = time.monotonic()
+    with _lock:
+        while _cache:
+            oldest, (_, last_used) = next(iter(_cache.items()))
+            if now - last_used < IDENTITY_CACHE_IDLE_TTL:
+                break
+            del _cache[oldest]
+        entry = _cache.get(sender)
+        if entry is None:
+            return None
+        entry[1] = now
+        _cache.move_to_end(sender)
+        return entry[0]
+
+
+def _cache_put(sender: str, record: dict) -> None:
+    with _lock:
+        _cache[sender] = [record, time.monotonic()]
+        _cache.move_to_end(sender)
+        while len(_cache) > IDENTITY_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def migrate_legacy_identities(storage) -> int:
+    """Move records from the legacy "identity" list to per-sender keys. Returns how many moved.
+
+    The move is one batched write, so it needs a storage with set_many (SQLiteStorage). The
+    JSON store rewrites its whole file on every set; there the legacy list is left in place
+    and read through an in-memory index instead.
+    """
+    with _lock:
+        if id(storage) in _migrated:
+            return 0
+        _migrated.add(id(storage))
+    legacy = storage.get(LEGACY_IDENTITY_KEY)
+    if legacy is None:
+        return 0
+    if not isinstance(legacy, list):
+        legacy = [legacy]
+    by_sender: Dict[str, dict] = {}
+    for item in legacy:
+        # The first record per sender wins, matching the old linear scan
+        if isinstance(item, dict) and item.get("sender"):
+            by_sender.setdefault(item["sender"], item)
+    if not hasattr(storage, "set_many"):
+        _legacy_index[id(storage)] = by_sender
+        return 0
+    with storage.batch():
+        items = [(_identity_key(sender), item) for sender, item in by_sender.items() if storage.get(_identity_key(sender)) is None]
+        storage.set_many(items)
+        storage.remove(LEGACY_IDENTITY_KEY)
+    print(f"[IdentityStore] Migrated {len(items)} identities from the legacy list")
+    return len(items)
+
+
+def get_identity(storage, sender: str) -> Optional[dict]:
+    """The sender's identity record ({principal, private_key, public_key, sender}) or None."""
+    if not sender:
+        return None
+    record = _cache_get(sender)
+    if record is not None:
+        return record
+    migrate_legacy_identities(storage)
+    record = storage.get(_identity_key(sender))
+    if not isinstance(record, dict):
+        record = _legacy_index.get(id(storage), {}).get(sender)
+    if isinstance(record, dict):
+        _cache_put(sender, record)
+        return record
+    return None
+
+
+def save_identity(storage, record: dict) -> None:
+    sender = record["sender"]
+    storage.set(_identity_key(sender), record)
+    _cache_put(sender, record)
+
+
+def ensure_identity(storage, sender: str) -> Tuple[dict, bool]:
+    """Return (record, created): the sender's identity, generating and storing one if missing."""
+    record = get_identity(storage, sender)
+    if record is not None:
+        return record, False
+    principal, priv_b64, pub_b64 = take_identity()
+    record = {
+        "principal": principal,
+        "private_key": priv_b64,
+        "public_key": pub_b64,
+        "sender": sender,
+    }
+    save_identity(storage, record)
+    return record, True
@@ -0,0 +1,198 @@
+import json
+import re
+import threading
+import unicodedata
+from collections import Counter
+from decimal import Decimal, InvalidOperation
+from typing import List, Optional, Tuple
+
+from utils.pricing import ALIASES
+
+
+# Local intent parser for common, unambiguous commands ("btc balance", "show my solana address",
+# "send 0.5 sol to <address>"). A match yields tool calls shaped like ASI1's, so process_query
+# can skip the tool-selection round trip. Anything it is not sure about returns None and goes to the LLM.
+
+_CHAINS = {
+    "BTC": "bitcoin",
+    "ETH": "ethereum",
+    "SOL": "solana",
+    "ICP": "icp",
+}
+
+# Coin names from the pricing alias table, longest first so "internet computer" wins over single words
+_COIN_NAMES = sorted(((name.lower(), symbol) for name, symbol in ALIASES.items()), key=lambda item: -len(item[0]))
+
+# Words that carry no intent; any other leftover word makes the message ambiguous
+_FILLER = {
+    "a", "account", "all", "am", "an", "and", "any", "are", "can", "check", "coin", "coins", "current",
+    "display", "do", "does", "for", "get", "give", "have", "how", "i", "in", "is", "it", "let", "me",
+    "much", "my", "now", "of", "on", "please", "pls", "plz", "see", "show", "tell", "the", "to", "view",
+    "wallet", "what", "whats", "what's", "which", "you", "your",
+}
+_ADDRESS_WORDS = {"address", "addr", "deposit", "receive", "receiving"}
+_BALANCE_WORDS = {"balance", "balances", "holding", "holdings", "funds"}
+_PORTFOLIO_WORDS = {"portfolio", "networth", "net", "worth", "total", "everything", "overview"}
+_PRICE_WORDS = {"price", "prices", "worth", "value", "cost", "rate"}
+_HELP_WORDS = {"help", "commands", "menu"}
+_HELP_PHRASES = {"what can you do", "what do you do", "how does this work"}
+_SEND_WORDS = {"send", "transfer", "pay"}
+_BUY_WORDS = {"buy", "purchase"}
+# Negations, fiat amounts and conditionals are left to the LLM
+_REJECT_WORDS = {"not", "don't", "dont", "never", "cancel", "if", "when", "usd", "dollar", "dollars", "usdt", "usdc", "sell", "swap"}
+
+_NUMBER = r"(\d+(?:\.\d+)?|\.\d+)"
+_SEND_RE = re.compile(
+    rf"^(?:please\s+)?(?:send|transfer|pay)\s+{_NUMBER}\s+([a-z ]+?)\s+to\s+(\S+)\s*$",
+    re.IGNORECASE,
+)
+_BUY_RE = re.compile(rf"^(?:please\s+)?(?:i\s+want\s+to\s+)?(?:buy|purchase)\s+{_NUMBER}\s+([a-z ]+?)\s*$", re.IGNORECASE)
+
+_ADDRESS_PATTERNS = {
+    "BTC": re.compile(r"^(?:(?:bc|tb|bcrt)1[02-9ac-hj-np-z]{11,87}|[123mn][1-9A-HJ-NP-Za-km-z]{25,34})$"),
+    "ETH": re.compile(r"^0x[0-9a-fA-F]{40}$"),
+    "SOL": re.compile(r"^[1-9A-HJ-NP-Za-km-z]{32,44}$"),
+    "ICP": re.compile(r"^(?:[a-z0-9]{5}-){4,10}[a-z0-9]{1,5}$|^[0-9a-f]{64}$"),
+}
+
+_lock = threading.Lock()
+_stats = {"queries": 0, "hits": 0}
+_hits_by_tool: Counter = Counter()
+
+
+def _normalize(text: str) -> str:
+    try:
+        text = unicodedata.normalize("NFKC", text or "")
+    except Exception:
+        text = text or ""
+    text = re.sub(r"\s+", " ", text.strip().lower())
+    return text.rstrip(" ?!.")
+
+
+def _coin_for(name: str) -> Optional[str]:
+    return ALIASES.get(name.strip().upper())
+
+
+def _find_coins(text: str) -> Tuple[List[str], str]:
+    """Coins mentioned in the text (in order of appearance, deduplicated) and the text with them removed."""
+    # Longest names are matched first; blanking them with same-length padding keeps positions stable
+    positions = {}
+    for name, symbol in _COIN_NAMES:
+        pattern = rf"\b{re.escape(name)}\b"
+        for m in re.finditer(pattern, text):
+            positions[symbol] = min(m.start(), positions.get(symbol, m.start()))
+        text = re.sub(pattern, lambda m: " " * len(m.group(0)), text)
+    found = sorted(positions, key=positions.get)
+    return found, text
+
+
+def _words(text: str) -> List[str]:
+    return re.findall(r"[a-z']+|\d+(?:\.\d+)?", text)
+
+
+def _amount(raw: str) -> Optional[float]:
+    try:
+        value = Decimal(raw)
+    except InvalidOperation:
+        return None
+    return float(value) if value > 0 else None
+
+
+def _match_send(original: str) -> Optional[List[Tuple[str, dict]]]:
+    m = _SEND_RE.match(original.strip().rstrip(" ."))
+    if not m:
+        return None
+    amount, coin, destination = _amount(m.group(1)), _coin_for(m.group(2)), m.group(3)
+    if amount is None or coin is None or not _ADDRESS_PATTERNS[coin].match(destination):
+        return None
+    return [(f"send_{_CHAINS[coin]}", {"destinationAddress": destination, "amount": amount})]
+
+
+def _match_buy(text: str) -> Optional[List[Tuple[str, dict]]]:
+    m = _BUY_RE.match(text)
+    if not m:
+        return None
+    amount, coin = _amount(m.group(1)), _coin_for(m.group(2))
+    if amount is None or coin is None:
+        return None
+    return [("buy_crypto", {"coinType": coin.lower(), "amount": amount})]
+
+
+def _match_read(text: str) -> Optional[List[Tuple[str, dict]]]:
+    coins, rest = _find_coins(text)
+    words = _words(rest)
+    amounts = [w for w in words if w[0].isdigit()]
+    words = [w for w in words if not w[0].isdigit()]
+    keywords = {w for w in words if w not in _FILLER}
+
+    if not coins and ((keywords and keywords <= _HELP_WORDS) or text in _HELP_PHRASES):
+        return [("help", {})]
+
+    if keywords & _ADDRESS_WORDS and not (keywords - _ADDRESS_WORDS) and coins and not amounts:
+        return [(f"get_{_CHAINS[coin]}_address", {}) for coin in coins]
+
+    if keywords & _BALANCE_WORDS and not (keywords - _BALANCE_WORDS - _PORTFOLIO_WORDS) and not amounts:
+        if not coins or keywords & _PORTFOLIO_WORDS:
+            return [("get_portfolio", {})] if not coins else None
+        return [(f"get_{_CHAINS[coin]}_balance", {}) for coin in coins]
+
+    if keywords and keywords <= _PORTFOLIO_WORDS and keywords != {"worth"} and not coins and not amounts:
+        return [("get_portfolio", {})]
+
+    if keywords & _PRICE_WORDS and not (keywords - _PRICE_WORDS) and len(coins) == 1 and len(amounts) <= 1:
+        amount = _amount(amounts[0]) if amounts else 1
+        if amount is None:
+            return None
+        return [("get_coin_price", {"coin_type": coins[0], "amount": amount})]
+
+    # "how much is 2 eth"
+    if not keywords and len(coins) == 1 and len(amounts) == 1 and re.match(r"^how much (?:is|are)\b", text):
+        amount = _amount(amounts[0])
+        return [("get_coin_price", {"coin_type": coins[0], "amount": amount})] if amount else None
+
+    return None
+
+
+def match_intent(text: str) -> Optional[List[Tuple[str, dict]]]:
+    """[(tool name, arguments), ...] for a confidently recognised command, else None."""
+    normalized = _normalize(text)
+    if not normalized or len(normalized) > 200:
+        return None
+    words = set(_words(normalized))
+    if words & _REJECT_WORDS or "$" in normalized:
+        return None
+    if words & _SEND_WORDS:
+        return _match_send(text)
+    if words & _BUY_WORDS:
+        return _match_buy(normalized)
+    return _match_read(normalized)
+
+
+def fast_tool_calls(text: str) -> Optional[list]:
+    """match_intent as ASI1-style tool_calls (with ids and JSON arguments), recording hit-rate stats."""
+    intents = match_intent(text)
+    with _lock:
+        _stats["queries"] += 1
+        if intents:
+            _stats["hits"] += 1
+            _hits_by_tool.update(name for name, _ in intents)
+    if not intents:
+        return None
+    return [
+        {
+            "id": f"fastpath_{i}",
+            "type": "function",
+            "function": {"name": name, "arguments": json.dumps(args)},
+        }
+        for i, (name, args) in enumerate(intents)
+    ]
+
+
+def get_intent_stats() -> dict:
+    with _lock:
+        queries = _stats["queries"]
+        return {
+            **_stats,
+            "hit_rate": round(_stats["hits"] / queries, 3) if queries else 0.0,
+            "by_tool": dict(_hits_by_tool),
+        }
@@ -0,0 +1,227 @@
+import time
+from typing import Dict, Optional
+
+from config.settings import INVENTORY_RESERVATION_TTL
+from utils.candid import unwrap_candid
+from utils.canister import make_async_canister
+from utils.identity import generate_ed25519_identity
+from utils.http_client import run_blocking
+from utils.shared_db import get_connection, immediate_transaction, register_schema
+from utils.singleflight import SingleFlight
+from utils.storage import record_order
+from utils.stripe import create_checkout_session_async
+
+
+# Buy-flow inventory ledger, shared with webhook.py through the shared SQLite file.
+#
+# available = on_hand - sum(active reservations)
+#
+# on_hand is seeded from the canister's canister_wallet_balance and lowered when
+# the webhook consumes a reservation, until the next sync reports the new balance.
+# Amounts are stored as decimal strings: wei values overflow SQLite's 64-bit integers.
+register_schema(
+    "CREATE TABLE IF NOT EXISTS inventory ("
+    " coin TEXT PRIMARY KEY, on_hand TEXT NOT NULL, synced_at REAL NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS inventory_reservations ("
+    " order_id TEXT PRIMARY KEY, coin TEXT NOT NULL, amount TEXT NOT NULL,"
+    " status TEXT NOT NULL, created_at REAL NOT NULL, expires_at REAL NOT NULL,"
+    " settled_at REAL)",
+    "CREATE INDEX IF NOT EXISTS inventory_reservations_active"
+    " ON inventory_reservations (coin, status, expires_at)",
+)
+
+RESERVED = "reserved"
+CONSUMED = "consumed"
+RELEASED = "released"
+
+# canister_wallet_balance field per coin
+_BALANCE_FIELDS = {"BTC": "bitcoin", "ETH": "ethereum", "SOL": "solana", "ICP": "icp"}
+
+# canister_wallet_balance does not depend on the caller; any identity will do
+_sync_private_key: Optional[str] = None
+# Buyers hitting a never-synced coin at once share one canister query and seed
+_sync_flight = SingleFlight("inventory_sync")
+
+
+class InsufficientInventoryError(Exception):
+    def __init__(self, coin: str, requested: int, available: int):
+        super().__init__(f"Insufficient {coin} inventory: requested {requested}, available {available}")
+        self.coin = coin
+        self.requested = requested
+        self.available = available
+
+
+def _expire_reservations(conn, now: float) -> None:
+    conn.execute(
+        "UPDATE inventory_reservations SET status = ?, settled_at = ? WHERE status = ? AND expires_at <= ?",
+        (RELEASED, now, RESERVED, now),
+    )
+
+
+def _available(conn, coin: str, now: float) -> Optional[int]:
+    row = conn.execute("SELECT on_hand FROM inventory WHERE coin = ?", (coin,)).fetchone()
+    if row is None:
+        return None
+    reserved = conn.execute(
+        "SELECT amount FROM inventory_reservations WHERE coin = ? AND status = ? AND expires_at > ?",
+        (coin, RESERVED, now),
+    ).fetchall()
+    return int(row[0]) - sum(int(amount) for (amount,) in reserved)
+
+
+def seed_inventory(balances: Dict[str, int], fetched_at: float) -> None:
+    """Set on_hand from a canister balance snapshot taken at fetched_at.
+
+    Payouts consumed after the snapshot was taken are not reflected in it yet,
+    so they are subtracted again.
+    """
+    with immediate_transaction() as conn:
+        for coin, balance in balances.items():
+            consumed_since = conn.execute(
+                "SELECT amount FROM inventory_reservations WHERE coin = ? AND status = ? AND settled_at > ?",
+                (coin, CONSUMED, fetched_at),
+            ).fetchall()
+            on_hand = int(balance) - sum(int(amount) for (amount,) in consumed_since)
+            conn.execute(
+                "INSERT INTO inventory (coin, on_hand, synced_at) VALUES (?, ?, ?)"
+                " ON CONFLICT (coin) DO UPDATE SET on_hand = excluded.on_hand, synced_at = excluded.synced_at",
+                (coin, str(on_hand), fetched_at),
+            )
+
+
+def get_available(coin: str) -> Optional[int]:
+    """Unreserved inventory in smallest units, or None if the coin was never synced."""
+    conn = get_connection()
+    return _available(conn, coin.upper(), time.time())
+
+
+def reserve(order_id: str, coin: str, amount: int, ttl: float = INVENTORY_RESERVATION_TTL) -> int:
+    """Atomically hold `amount` for an order. Returns what remains available.
+
+    Raises InsufficientInventoryError when the unreserved inventory is too small
+    (or has never been synced).
+    """
+    coin = coin.upper()
+    now = time.time()
+    with immediate_transaction() as conn:
+        _expire_reservations(conn, now)
+        available = _available(conn, coin, now) or 0
+        if amount > available:
+            raise InsufficientInventoryError(coin, amount, available)
+        conn.execute(
+            "INSERT INTO inventory_reservations (order_id, coin, amount, status, created_at, expires_at)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (str(order_id), coin, str(int(amount)), RESERVED, now, now + ttl),
+        )
+    return available - amount
+
+
+def release(order_id: str) -> bool:
+    """Return a reservation to the pool (checkout failed, cancelled or expired)."""
+    cur = get_connection().execute(
+        "UPDATE inventory_reservations SET status = ?, settled_at = ? WHERE order_id = ? AND status = ?",
+        (RELEASED, time.time(), str(order_id), RESERVED),
+    )
+    return cur.rowcount > 0
+
+
+def consume(order_id: str, coin: str, amount: Optional[int] = None) -> bool:
+    """Mark an order paid out and take the sent amount off on_hand.
+
+    amount is what was actually sent (the webhook recomputes it from the paid
+    USD at payout time); it defaults to the reserved amount. An order with no
+    reservation is still recorded when amount is given.
+    """
+    coin = coin.upper()
+    now = time.time()
+    with immediate_transaction() as conn:
+        row = conn.execute(
+            "SELECT amount, status FROM inventory_reservations WHERE order_id = ?", (str(order_id),)
+        ).fetchone()
+        if row is not None and row[1] == CONSUMED:
+            return False
+        if row is None and amount is None:
+            return False
+        sent = int(row[0]) if amount is None else int(amount)
+        conn.execute(
+            "INSERT INTO inventory_reservations (order_id, coin, amount, status, created_at, expires_at, settled_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT (order_id) DO UPDATE SET status = excluded.status, amount = excluded.amount,"
+            " settled_at = excluded.settled_at",
+            (str(order_id), coin, str(sent), CONSUMED, now, now, now),
+        )
+        on_hand = conn.execute("SELECT on_hand FROM inventory WHERE coin = ?", (coin,)).fetchone()
+        if on_hand is not None:
+            conn.execute("UPDATE inventory SET on_hand = ? WHERE coin = ?", (str(int(on_hand[0]) - sent), coin))
+    return True
+
+
+async def sync_inventory() -> Dict[str, int]:
+    """Seed the ledger from the wallet canister's own balances (concurrent calls share one sync)."""
+    return await _sync_flight.do_async("sync", _sync_inventory)
+
+
+async def _sync_inventory() -> Dict[str, int]:
+    global _sync_private_key
+    if _sync_private_key is None:
+        _, _sync_private_key, _ = generate_ed25519_identity()
+    wallet_canister = make_async_canister("wallet", _sync_private_key)
+    fetched_at = time.time()
+    balances = unwrap_candid(await wallet_canister.canister_wallet_balance()) or {}
+    seeded = {coin: int(balances.get(field) or 0) for coin, field in _BALANCE_FIELDS.items()}
+    await run_blocking(seed_inventory, seeded, fetched_at)
+    return seeded
+
+
+async def available_inventory(coin: str) -> int:
+    """Unreserved inventory for the buy pre-check; syncs from the canister only if never synced."""
+    available = await run_blocking(get_available, coin)
+    if available is None:
+        await sync_inventory()
+        available = await run_blocking(get_available, coin)
+    return available or 0
+
+
+async def create_reserved_checkout(*, order_id: str, coin_type: str, token_amount_smallest: int, amount_minor: int, destination_address: str, sender: Optional[str] = None) -> dict:
+    """Reserve inventory for the order, then create its Stripe checkout session.
+
+    Raises InsufficientInventoryError without creating a session; the
+    reservation is released again if the session cannot be created.
+    The order is recorded as "open" for the webhook to settle.
+    """
+    coin = coin_type.upper()
+    if await run_blocking(get_available, coin) is None:
+        await sync_inventory()
+    await run_blocking(reserve, order_id, coin, token_amount_smallest)
+    try:
+        session = await create_checkout_session_async(
+            order_id=order_id,
+            coin_type=coin_type,
+            amount_minor=amount_minor,
+            destination_address=destination_address,
+        )
+    except Exception:
+        await run_blocking(release, order_id)
+        raise
+    try:
+        await run_blocking(
+            record_order, order_id, coin,
+            sender=sender,
+            token_amount=str(token_amount_smallest),
+            amount_minor=amount_minor,
+            destination=destination_address,
+        )
+    except Exception as e:
+        print(f"[Inventory] Failed to record order {order_id}: {e}")
+    return session
+
+
+def get_inventory_stats() -> dict:
+    conn = get_connection()
+    now = time.time()
+    stats = {}
+    for coin, on_hand, synced_at in conn.execute("SELECT coin, on_hand, synced_at FROM inventory").fetchall():
+        stats[coin] = {"on_hand": on_hand, "available": str(_available(conn, coin, now)), "synced_ago_s": round(now - synced_at)}
+    for status, count in conn.execute("SELECT status, COUNT(*) FROM inventory_reservations GROUP BY status").fetchall():
+        stats[f"reservations_{status}"] = count
+    return stats
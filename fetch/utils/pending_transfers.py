@@ -0,0 +1,99 @@
+import math
+import threading
+import time
+from typing import Dict, Optional, Set
+
+from config.settings import PENDING_TRANSFER_TTL, PENDING_TRANSFER_SWEEP_INTERVAL
+
+
+# One storage record per sender ("pending_transfer:<sender>") instead of one shared dict
+PENDING_KEY_PREFIX = "pending_transfer:"
+LEGACY_PENDING_KEY = "pending_transfers"
+
+# Timer wheel: slot number -> senders whose confirmation expires within that slot.
+# A sweep only visits the slots that have elapsed, never the whole user base.
+_wheel: Dict[int, Set[str]] = {}
+_lock = threading.Lock()
+_legacy_dropped = set()  # id() of storages whose legacy dict was removed
+_stats = {"created": 0, "expired_rejected": 0, "swept": 0}
+
+
+def _pending_key(sender: str) -> str:
+    return f"{PENDING_KEY_PREFIX}{sender}"
+
+
+def _slot(ts: float) -> int:
+    return math.floor(ts / PENDING_TRANSFER_SWEEP_INTERVAL)
+
+
+def _drop_legacy(storage) -> None:
+    # Confirmations from the old shared dict have no timestamp; they cannot be trusted to be fresh
+    if id(storage) in _legacy_dropped:
+        return
+    _legacy_dropped.add(id(storage))
+    if storage.get(LEGACY_PENDING_KEY) is not None:
+        storage.remove(LEGACY_PENDING_KEY)
+
+
+def set_pending_transfer(storage, sender: str, pending: dict, ttl: float = PENDING_TRANSFER_TTL) -> dict:
+    _drop_legacy(storage)
+    now = time.time()
+    record = {**pending, "created_at": now, "expires_at": now + ttl}
+    storage.set(_pending_key(sender), record)
+    with _lock:
+        _wheel.setdefault(_slot(record["expires_at"]), set()).add(sender)
+        _stats["created"] += 1
+    return record
+
+
+def get_pending_transfer(storage, sender: str) -> Optional[dict]:
+    """The sender's pending confirmation, or None.
+
+    An expired record is removed and returned with "expired": True so the
+    caller can reject it instead of executing it.
+    """
+    _drop_legacy(storage)
+    record = storage.get(_pending_key(sender))
+    if not isinstance(record, dict):
+        return None
+    if time.time() >= float(record.get("expires_at") or 0):
+        storage.remove(_pending_key(sender))
+        with _lock:
+            _stats["expired_rejected"] += 1
+        return {**record, "expired": True}
+    return record
+
+
+def clear_pending_transfer(storage, sender: str) -> None:
+    if storage.get(_pending_key(sender)) is not None:
+        storage.remove(_pending_key(sender))
+
+
+def sweep_expired(storage) -> int:
+    """Remove confirmations whose wheel slot has elapsed. Returns how many were removed."""
+    now = time.time()
+    current = _slot(now)
+    with _lock:
+        due = [slot for slot in _wheel if slot < current]
+        senders = set()
+        for slot in due:
+            senders.update(_wheel.pop(slot))
+    removed = 0
+    for sender in senders:
+        record = storage.get(_pending_key(sender))
+        # The sender may have confirmed, cancelled or started a newer confirmation meanwhile
+        if isinstance(record, dict) and now >= float(record.get("expires_at") or 0):
+            storage.remove(_pending_key(sender))
+            removed += 1
+    # The SQLite backend can also drop confirmations left over from before a restart,
+    # which the in-memory wheel never saw
+    if hasattr(storage, "delete_expired_pending"):
+        removed += storage.delete_expired_pending(now)
+    with _lock:
+        _stats["swept"] += removed
+    return removed
+
+
+def get_pending_transfer_stats() -> dict:
+    with _lock:
+        return {**_stats, "wheel_slots": len(_wheel), "tracked": sum(len(s) for s in _wheel.values())}
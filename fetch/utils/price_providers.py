@@ -0,0 +1,260 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from utils.http_client import http_get
+from utils.singleflight import SingleFlight
+from config.settings import (
+    PRICE_PROVIDER_TIMEOUT,
+    PRICE_HEDGE_DELAY,
+    PRICE_BREAKER_WINDOW,
+    PRICE_BREAKER_MIN_CALLS,
+    PRICE_BREAKER_ERROR_RATE,
+    PRICE_BREAKER_CONSECUTIVE_FAILURES,
+    PRICE_BREAKER_COOLDOWN,
+)
+
+
+Prices = Dict[Tuple[str, str], Decimal]
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+def _to_positive_decimal(value) -> Optional[Decimal]:
+    try:
+        price = Decimal(str(value))
+    except Exception:
+        return None
+    return price if price > 0 else None
+
+
+class ProviderHealth:
+    """Rolling error/latency window plus a circuit breaker for one provider.
+
+    The breaker opens after PRICE_BREAKER_CONSECUTIVE_FAILURES failures in a row,
+    or when the error rate over the window reaches PRICE_BREAKER_ERROR_RATE.
+    After PRICE_BREAKER_COOLDOWN seconds a single probe call is let through
+    (half-open); its outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._window = deque(maxlen=PRICE_BREAKER_WINDOW)  # (ok, latency_seconds)
+        self._consecutive_failures = 0
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._state == CLOSED:
+                return True
+            if self._state == OPEN and time.monotonic() - self._opened_at >= PRICE_BREAKER_COOLDOWN:
+                self._state = HALF_OPEN
+            if self._state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record(self, ok: bool, latency: float) -> None:
+        with self._lock:
+            self._window.append((ok, latency))
+            if self._state == HALF_OPEN:
+                self._probe_in_flight = False
+                if ok:
+                    self._state = CLOSED
+                    self._consecutive_failures = 0
+                    self._window.clear()
+                else:
+                    self._open()
+                return
+            if ok:
+                self._consecutive_failures = 0
+                return
+            self._consecutive_failures += 1
+            failures = sum(1 for w_ok, _ in self._window if not w_ok)
+            error_rate = failures / len(self._window)
+            if (
+                self._consecutive_failures >= PRICE_BREAKER_CONSECUTIVE_FAILURES
+                or (len(self._window) >= PRICE_BREAKER_MIN_CALLS and error_rate >= PRICE_BREAKER_ERROR_RATE)
+            ):
+                self._open()
+
+    def _open(self) -> None:
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            latencies = sorted(lat for _, lat in self._window)
+            calls = len(self._window)
+            errors = sum(1 for ok, _ in self._window if not ok)
+            return {
+                "state": self._state,
+                "calls": calls,
+                "error_rate": round(errors / calls, 3) if calls else 0.0,
+                "p50_ms": round(latencies[len(latencies) // 2] * 1000) if latencies else None,
+                "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000) if latencies else None,
+            }
+
+
+class PriceProvider(ABC):
+    name = "provider"
+
+    def __init__(self):
+        self.health = ProviderHealth(self.name)
+
+    @abstractmethod
+    def fetch(self, tokens: Dict[str, str], currencies: List[str], logger=None) -> Prices:
+        """tokens maps CoinGecko id -> symbol; returns {(token_id, currency): Decimal}."""
+
+
+class CoinGeckoProvider(PriceProvider):
+    name = "coingecko"
+
+    def fetch(self, tokens, currencies, logger=None) -> Prices:
+        url = "https://api.coingecko.com/api/v3/simple/price"
+        params = {"ids": ",".join(tokens), "vs_currencies": ",".join(currencies)}
+        if logger:
+            logger.info(f"URL ID: {url} params={params}")
+        resp = http_get(url, params=params, timeout=PRICE_PROVIDER_TIMEOUT)
+        resp.raise_for_status()
+        data = resp.json()
+        if logger:
+            logger.info(f"Data: {data}")
+        prices: Prices = {}
+        for token_id in tokens:
+            quotes = data.get(token_id) or {}
+            for currency in currencies:
+                price = _to_positive_decimal(quotes.get(currency))
+                if price is not None:
+                    prices[(token_id, currency)] = price
+        return prices
+
+
+class CryptoCompareProvider(PriceProvider):
+    name = "cryptocompare"
+
+    def fetch(self, tokens, currencies, logger=None) -> Prices:
+        url = "https://min-api.cryptocompare.com/data/pricemulti"
+        params = {
+            "fsyms": ",".join(sorted(set(tokens.values()))),
+            "tsyms": ",".join(currency.upper() for currency in currencies),
+        }
+        if logger:
+            logger.info(f"URL ID: {url} params={params}")
+        resp = http_get(url, params=params, timeout=PRICE_PROVIDER_TIMEOUT)
+        resp.raise_for_status()
+        data = resp.json()
+        prices: Prices = {}
+        for token_id, symbol in tokens.items():
+            quotes = data.get(symbol) or {}
+            for currency in currencies:
+                price = _to_positive_decimal(quotes.get(currency.upper()))
+                if price is not None:
+                    prices[(token_id, currency)] = price
+        return prices
+
+
+# In priority order: the first is the primary, the rest are hedges/fallbacks
+PROVIDERS: List[PriceProvider] = [CoinGeckoProvider(), CryptoCompareProvider()]
+
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="price-provider")
+
+# Identical in-flight requests to one provider share a single HTTP call
+_price_flight = SingleFlight("price")
+
+
+def _call_provider(provider: PriceProvider, tokens, currencies, logger=None) -> Prices:
+    key = (provider.name, tuple(sorted(tokens.items())), tuple(currencies))
+    return _price_flight.do(key, _call_provider_once, provider, tokens, currencies, logger)
+
+
+def _call_provider_once(provider: PriceProvider, tokens, currencies, logger=None) -> Prices:
+    started = time.monotonic()
+    try:
+        prices = provider.fetch(tokens, currencies, logger=logger)
+    except Exception:
+        provider.health.record(False, time.monotonic() - started)
+        raise
+    # An empty answer (e.g. unknown symbol) is not a provider fault
+    provider.health.record(True, time.monotonic() - started)
+    return prices
+
+
+def fetch_prices_hedged(tokens: Dict[str, str], currencies: List[str], logger=None) -> Prices:
+    """Query providers concurrently and return the first complete answer.
+
+    The primary provider is asked first; if it has not answered within
+    PRICE_HEDGE_DELAY (or fails), the next allowed provider is asked too.
+    Providers whose circuit breaker is open are skipped. When no single
+    provider returns every requested price, the partial answers are merged
+    in priority order once all calls finish or the overall deadline elapses:
+    the last hedge's launch delay plus its own PRICE_PROVIDER_TIMEOUT, so a
+    primary hanging until its timeout still leaves the hedges theirs.
+    """
+    if not tokens or not currencies:
+        return {}
+    wanted = {(token_id, currency) for token_id in tokens for currency in currencies}
+    deadline = time.monotonic() + PRICE_HEDGE_DELAY * (len(PROVIDERS) - 1) + PRICE_PROVIDER_TIMEOUT
+    running = {}  # future -> priority
+    answers: Dict[int, Prices] = {}
+    next_index = 0
+
+    def launch() -> bool:
+        # Ask the breaker only when the provider is actually about to be called,
+        # so a half-open probe slot is never claimed without a call.
+        nonlocal next_index
+        while next_index < len(PROVIDERS):
+            priority = next_index
+            next_index += 1
+            provider = PROVIDERS[priority]
+            if provider.health.allow():
+                running[_executor.submit(_call_provider, provider, tokens, currencies, logger)] = priority
+                return True
+        return False
+
+    if not launch():
+        if logger:
+            logger.info("[pricing] all price providers are circuit-open")
+        return {}
+
+    while running:
+        now = time.monotonic()
+        if now >= deadline:
+            break
+        hedge_pending = next_index < len(PROVIDERS)
+        timeout = min(PRICE_HEDGE_DELAY, deadline - now) if hedge_pending else deadline - now
+        done, _ = wait(list(running), timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            priority = running.pop(future)
+            try:
+                prices = future.result()
+            except Exception as e:
+                if logger:
+                    logger.info(f"[pricing] {PROVIDERS[priority].name} failed: {e}")
+                continue
+            if prices:
+                answers[priority] = prices
+                if wanted.issubset(prices):
+                    return prices
+        # Hedge: the primary is slow or failed without a complete answer
+        if hedge_pending and (not done or not running):
+            launch()
+
+    merged: Prices = {}
+    for priority in sorted(answers, reverse=True):
+        merged.update(answers[priority])
+    return merged
+
+
+def get_provider_stats() -> dict:
+    """Rolling error rate, latency percentiles and breaker state per provider."""
+    return {p.name: p.health.snapshot() for p in PROVIDERS}
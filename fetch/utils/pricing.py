@@ -1,14 +1,23 @@
 from decimal import Decimal
-from typing import Optional, Tuple
-import requests
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config.settings import PRICE_CACHE_TTL, PRICE_CACHE_STALE_TTL, PRICE_CACHE_TTL_OVERRIDES
+from utils.cache import TTLCache, MISS, STALE
+from utils.token_index import token_index
+from utils.http_client import http_get
+from utils.price_providers import fetch_prices_hedged
 
 
 TOKENS_CONFIG = {
     "BTC": {"id": "bitcoin", "symbol": "BTC"},
     "ETH": {"id": "ethereum", "symbol": "ETH"},
     "SOL": {"id": "solana", "symbol": "SOL"},
+    "ICP": {"id": "internet-computer", "symbol": "ICP"},
 }
 
+# Process-wide price cache keyed by (CoinGecko id, currency)
+_price_cache = TTLCache(ttl=PRICE_CACHE_TTL, stale_ttl=PRICE_CACHE_STALE_TTL, name="price")
+
 ALIASES = {
     # Bitcoin
     "BTC": "BTC",
@@ -20,15 +29,19 @@ ALIASES = {
     # Solana
     "SOL": "SOL",
     "SOLANA": "SOL",
+    # Internet Computer
+    "ICP": "ICP",
+    "INTERNET COMPUTER": "ICP",
 }
 
 
 def resolve_token_identifiers(raw_token: str) -> Tuple[Optional[str], Optional[str]]:
     """Resolve CoinGecko id and normalized symbol for a token.
 
-    1) Use static mapping for common tokens (BTC/ETH/SOL)
-    2) Otherwise, try CoinGecko search API to find an id by symbol/name
-    3) Fallback to guessed id (lowercased, spaces->dashes) and uppercase symbol
+    1) Use static mapping for common tokens (BTC/ETH/SOL/ICP)
+    2) Otherwise, look the token up in the local token index (exact, prefix, fuzzy)
+    3) Otherwise, try CoinGecko search API and remember the result in the index
+    4) Fallback to guessed id (lowercased, spaces->dashes) and uppercase symbol
     """
     if not raw_token:
         return None, None
@@ -41,9 +54,13 @@ def resolve_token_identifiers(raw_token: str) -> Tuple[Optional[str], Optional[s
     if mapped:
         return mapped.get("id"), mapped.get("symbol")
 
+    indexed = token_index.search(normalized)
+    if indexed:
+        return indexed
+
     # Try CoinGecko search endpoint
     try:
-        resp = requests.get(
+        resp = http_get(
             "https://api.coingecko.com/api/v3/search",
             params={"query": normalized},
             timeout=10,
@@ -68,6 +85,7 @@ def resolve_token_identifiers(raw_token: str) -> Tuple[Optional[str], Optional[s
         if chosen:
             resolved_id = chosen.get("id") or guessed_id
             resolved_symbol = str(chosen.get("symbol", symbol)).upper()
+            token_index.remember(resolved_id, resolved_symbol, chosen.get("name") or resolved_id, chosen.get("market_cap_rank"))
             return resolved_id, resolved_symbol
     except Exception:
         pass
@@ -90,103 +108,131 @@ def _format_usd_dynamic(usd_value: Decimal) -> str:
     return f"${small}"
 
 
-def get_price_usd(coin_type: str, amount_in_token: float, logger=None) -> str:
-    # Validate amount
-    try:
-        if amount_in_token is None:
-            return "$0.00"
-        amount_num = Decimal(str(amount_in_token))
-        if amount_num <= 0:
-            return "$0.00"
-    except Exception:
-        return "$0.00"
+def _fetch_prices(tokens: Dict[str, str], currencies: List[str], logger=None) -> Dict[Tuple[str, str], Decimal]:
+    """Fetch unit prices for several tokens in one round trip per provider.
 
-    # Resolve identifiers for general token support
-    token_id, token_symbol = resolve_token_identifiers(coin_type)
-    if not token_id or not token_symbol:
-        return "$0.00"
+    tokens maps CoinGecko id -> symbol; currencies are lowercase codes (e.g. "usd").
+    Providers (CoinGecko, CryptoCompare) are hedged and circuit-broken, see
+    utils.price_providers. Returns {(token_id, currency): Decimal}.
+    """
+    return fetch_prices_hedged(tokens, currencies, logger=logger)
+
+
+def _price_ttl(token_symbol: str, token_id: str) -> float:
+    overrides = PRICE_CACHE_TTL_OVERRIDES
+    return overrides.get(token_symbol.upper(), overrides.get(token_id.upper(), PRICE_CACHE_TTL))
+
+
+def get_price_cache_stats() -> dict:
+    """Hit/miss/staleness counters of the process-wide price cache."""
+    return _price_cache.stats()
 
-    # Build endpoints
-    url_coingecko = f"https://api.coingecko.com/api/v3/simple/price?ids={token_id}&vs_currencies=usd"
-    url_cryptocompare = f"https://min-api.cryptocompare.com/data/price?fsym={token_symbol}&tsyms=USD"
 
-    logger.info(f"URL ID: {url_coingecko}")
-    logger.info(f"URL ID: {url_cryptocompare}")
-    price_usd: Optional[Decimal] = None
+def get_prices(coins: Iterable[str], currencies: Iterable[str] = ("usd",), logger=None) -> Dict[str, Dict[str, Optional[Decimal]]]:
+    """Return unit prices for several coins in several currencies.
 
-    # Try CoinGecko first
+    Result maps each requested coin (as given) to {CURRENCY: Decimal or None}.
+    Cached prices are reused; everything else is fetched with a single upstream
+    request, and stale entries are refreshed together in the background.
+    """
+    coins = list(coins)
+    currencies = [str(c).strip().lower() for c in currencies if str(c).strip()]
+    resolved: Dict[str, Tuple[str, str]] = {}
+    for coin in coins:
+        token_id, token_symbol = resolve_token_identifiers(coin)
+        if token_id and token_symbol:
+            resolved[coin] = (token_id, token_symbol)
+
+    symbols = {token_id: token_symbol for token_id, token_symbol in resolved.values()}
+
+    def ttl_for(key):
+        token_id, _ = key
+        return _price_ttl(symbols.get(token_id, token_id), token_id)
+
+    found: Dict[Tuple[str, str], Decimal] = {}
+    missing: Dict[str, str] = {}
+    stale_keys = []
+    for token_id, token_symbol in symbols.items():
+        for currency in currencies:
+            key = (token_id, currency)
+            value, state = _price_cache.get(key)
+            if state == MISS:
+                missing[token_id] = token_symbol
+                continue
+            found[key] = value
+            if state == STALE:
+                stale_keys.append(key)
+
+    if missing:
+        fetched = _fetch_prices(missing, currencies, logger=logger)
+        for key, price in fetched.items():
+            _price_cache.set(key, price, ttl_for(key))
+        found.update(fetched)
+
+    if stale_keys:
+        def reload(keys):
+            ids = {token_id: symbols[token_id] for token_id, _ in keys}
+            wanted = sorted({currency for _, currency in keys})
+            return _fetch_prices(ids, wanted)
+
+        _price_cache.refresh_many_in_background(stale_keys, reload, ttl_for=ttl_for)
+
+    result: Dict[str, Dict[str, Optional[Decimal]]] = {}
+    for coin in coins:
+        token_id = resolved.get(coin, (None, None))[0]
+        result[coin] = {currency.upper(): found.get((token_id, currency)) for currency in currencies}
+    return result
+
+
+def get_prices_usd(coins: Iterable[str], logger=None) -> Dict[str, Optional[Decimal]]:
+    """Return {coin: USD unit price or None} for several coins in one round trip."""
+    coins = list(coins)
+    prices = get_prices(coins, ("usd",), logger=logger)
+    return {coin: prices[coin]["USD"] for coin in coins}
+
+
+def format_usd_value(amount_in_token, price_usd: Optional[Decimal]) -> str:
+    """Format amount * unit price the same way get_price_usd does."""
     try:
-        resp = requests.get(url_coingecko, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
-        if logger:
-            logger.info(f"Data: {data}")
-        value = data.get(token_id, {}).get("usd")
-        if value is None:
-            raise ValueError("CoinGecko returned no USD price for id")
-        price_usd = Decimal(str(value))
-    except Exception:
-        try:
-            resp = requests.get(url_cryptocompare, timeout=10)
-            resp.raise_for_status()
-            data = resp.json()
-            value = data.get("USD")
-            if value is None:
-                return "$0.00"
-            price_usd = Decimal(str(value))
-        except Exception:
+        if amount_in_token is None or price_usd is None or price_usd <= 0:
             return "$0.00"
-
-    if price_usd is None or price_usd <= 0:
+        usd_value = Decimal(str(amount_in_token)) * price_usd
+    except Exception:
         return "$0.00"
-
-    usd_value = amount_num * price_usd
     if usd_value <= 0:
         return "$0.00"
-
     return _format_usd_dynamic(usd_value)
 
 
+def get_price_usd(coin_type: str, amount_in_token: float, logger=None) -> str:
+    # Validate amount
+    try:
+        if amount_in_token is None:
+            return "$0.00"
+        amount_num = Decimal(str(amount_in_token))
+        if amount_num <= 0:
+            return "$0.00"
+    except Exception:
+        return "$0.00"
+
+    return format_usd_value(amount_num, get_price_usd_number(coin_type, logger=logger))
+
 
-def get_price_usd_number(coin_type: str):
+def get_price_usd_number(coin_type: str, logger=None):
     """Return the current price in USD for one unit of the given token.
 
+    Prices are served from the process-wide cache; a stale entry is returned
+    immediately while a background refresh replaces it.
+
     Returns Decimal or None on failure.
     """
     token_id, token_symbol = resolve_token_identifiers(coin_type)
     if not token_id or not token_symbol:
         return None
 
-    url_coingecko = f"https://api.coingecko.com/api/v3/simple/price?ids={token_id}&vs_currencies=usd"
-    url_cryptocompare = f"https://min-api.cryptocompare.com/data/price?fsym={token_symbol}&tsyms=USD"
-
-    # Try CoinGecko first
-    try:
-        resp = requests.get(url_coingecko, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
-        value = data.get(token_id, {}).get("usd")
-        if value is None:
-            raise ValueError("CoinGecko returned no USD price for id")
-        price_usd = Decimal(str(value))
-        if price_usd > 0:
-            return price_usd
-    except Exception:
-        pass
-
-    # Fallback to CryptoCompare
-    try:
-        resp = requests.get(url_cryptocompare, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
-        value = data.get("USD")
-        if value is None:
-            return None
-        price_usd = Decimal(str(value))
-        if price_usd > 0:
-            return price_usd
-    except Exception:
-        return None
-
-    return None
-
+    key = (token_id, "usd")
+    return _price_cache.get_or_load(
+        key,
+        lambda: _fetch_prices({token_id: token_symbol}, ["usd"], logger=logger).get(key),
+        ttl=_price_ttl(token_symbol, token_id),
+    )
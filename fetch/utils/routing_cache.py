@@ -0,0 +1,161 @@
+import json
+import re
+import threading
+from collections import OrderedDict
+from decimal import Decimal, InvalidOperation
+from typing import List, Optional, Tuple
+
+from config.settings import ROUTING_CACHE_SIZE, ROUTING_CACHE_MIN_AGREEMENTS, ROUTING_CACHE_MIN_CONFIDENCE
+from utils.text import normalize_text_basic
+
+
+# Remembers which tools ASI1 picked for a query *shape* ("send <num> sol to <addr>"), never the answer.
+# Arguments are stored as a template whose slots point at the numbers/addresses of the query, so a
+# repeated intent is re-dispatched with the new message's own values.
+#
+# Confidence: a signature is only served after the model chose the same template
+# ROUTING_CACHE_MIN_AGREEMENTS times in a row, and while agreements / observations stays
+# above ROUTING_CACHE_MIN_CONFIDENCE. A different choice replaces the template and restarts the count.
+
+_ADDRESS_RE = re.compile(
+    r"\b(?:0x[0-9a-fA-F]{40}"                      # Ethereum
+    r"|(?:bc|tb|bcrt)1[02-9ac-hj-np-z]{11,87}"     # Bitcoin bech32
+    r"|[0-9a-f]{64}"                               # ICP account id
+    r"|(?:[a-z0-9]{5}-){4,10}[a-z0-9]{1,5}"        # ICP principal
+    r"|[1-9A-HJ-NP-Za-km-z]{32,44}"                # Solana / Bitcoin base58
+    r"|[13mn2][1-9A-HJ-NP-Za-km-z]{25,34})\b"
+)
+_NUMBER_RE = re.compile(r"(\$\s*)?(?<![\w.])(\d*\.?\d+)(?![\w.]*\w)")
+
+# Placeholder words that survive normalize_text_basic; "$50" and "50" must not share a signature
+_ADDR_SLOT = " zzaddrzz "
+_NUM_SLOT = " zznumzz "
+_USD_SLOT = " zzusdzz "
+
+_entries: "OrderedDict[str, dict]" = OrderedDict()
+_lock = threading.Lock()
+_stats = {"lookups": 0, "hits": 0, "observed": 0, "conflicts": 0, "uncacheable": 0, "evictions": 0}
+
+
+def query_signature(query: str) -> Tuple[str, List[str], List[str]]:
+    """(signature, numbers, addresses): the normalized query with numbers and addresses abstracted out."""
+    addresses = _ADDRESS_RE.findall(query or "")
+    text = _ADDRESS_RE.sub(_ADDR_SLOT, query or "")
+    numbers = []
+
+    def _slot(m: re.Match) -> str:
+        numbers.append(m.group(2))
+        return _USD_SLOT if m.group(1) else _NUM_SLOT
+
+    text = _NUMBER_RE.sub(_slot, text)
+    signature = (
+        normalize_text_basic(text)
+        .replace("zzaddrzz", "<addr>")
+        .replace("zznumzz", "<num>")
+        .replace("zzusdzz", "$<num>")
+    )
+    return signature, numbers, addresses
+
+
+def _as_decimal(value) -> Optional[Decimal]:
+    if isinstance(value, bool):
+        return None
+    try:
+        return Decimal(str(value))
+    except (InvalidOperation, ValueError):
+        return None
+
+
+def _template_value(value, numbers: List[str], addresses: List[str]):
+    """Slot reference for an argument value, the literal itself, or raise ValueError if unsafe to reuse."""
+    if isinstance(value, str) and value in addresses:
+        return {"$addr": addresses.index(value)}
+    if isinstance(value, str) and _ADDRESS_RE.fullmatch(value):
+        raise ValueError("address not taken from the query")
+    number = _as_decimal(value) if isinstance(value, (int, float, str)) else None
+    if number is not None:
+        for i, raw in enumerate(numbers):
+            if _as_decimal(raw) == number:
+                return {"$num": i, "as_text": isinstance(value, str)}
+        # A number the model inferred is only a safe literal when the query had none of its own
+        if numbers:
+            raise ValueError("number not taken from the query")
+    return value
+
+
+def _fill(value, numbers: List[str], addresses: List[str]):
+    if isinstance(value, dict) and "$num" in value:
+        raw = numbers[value["$num"]]
+        return raw if value.get("as_text") else float(raw)
+    if isinstance(value, dict) and "$addr" in value:
+        return addresses[value["$addr"]]
+    return value
+
+
+def remember_tool_calls(query: str, tool_calls: list) -> None:
+    """Record the model's routing decision for this query's signature."""
+    if ROUTING_CACHE_SIZE <= 0 or not tool_calls:
+        return
+    signature, numbers, addresses = query_signature(query)
+    try:
+        template = [
+            (
+                call["function"]["name"],
+                {k: _template_value(v, numbers, addresses) for k, v in json.loads(call["function"]["arguments"] or "{}").items()},
+            )
+            for call in tool_calls
+        ]
+    except (ValueError, KeyError, TypeError):
+        with _lock:
+            _stats["uncacheable"] += 1
+        return
+    with _lock:
+        _stats["observed"] += 1
+        entry = _entries.get(signature)
+        if entry is None:
+            entry = _entries[signature] = {"template": template, "agreements": 0, "observations": 0}
+        elif entry["template"] != template:
+            entry["template"] = template
+            entry["agreements"] = 0
+            _stats["conflicts"] += 1
+        entry["agreements"] += 1
+        entry["observations"] += 1
+        _entries.move_to_end(signature)
+        while len(_entries) > ROUTING_CACHE_SIZE:
+            _entries.popitem(last=False)
+            _stats["evictions"] += 1
+
+
+def cached_tool_calls(query: str) -> Optional[list]:
+    """ASI1-style tool_calls for a confidently known signature, filled with this query's values."""
+    if ROUTING_CACHE_SIZE <= 0:
+        return None
+    signature, numbers, addresses = query_signature(query)
+    with _lock:
+        _stats["lookups"] += 1
+        entry = _entries.get(signature)
+        if entry is None:
+            return None
+        confidence = entry["agreements"] / entry["observations"]
+        if entry["agreements"] < ROUTING_CACHE_MIN_AGREEMENTS or confidence < ROUTING_CACHE_MIN_CONFIDENCE:
+            return None
+        _entries.move_to_end(signature)
+        template = entry["template"]
+        _stats["hits"] += 1
+    return [
+        {
+            "id": f"routed_{i}",
+            "type": "function",
+            "function": {
+                "name": name,
+                "arguments": json.dumps({k: _fill(v, numbers, addresses) for k, v in args.items()}),
+            },
+        }
+        for i, (name, args) in enumerate(template)
+    ]
+
+
+def get_routing_cache_stats() -> dict:
+    with _lock:
+        lookups = _stats["lookups"]
+        return {**_stats, "hit_rate": round(_stats["hits"] / lookups, 3) if lookups else 0.0, "size": len(_entries)}
@@ -0,0 +1,50 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Iterator, List
+
+from config.settings import SHARED_STATE_DB
+
+
+# SQLite file shared by the agent and webhook.py (separate processes).
+# One connection per thread; WAL lets readers run alongside the single writer.
+_local = threading.local()
+_schema: List[str] = []
+
+
+def register_schema(*statements: str) -> None:
+    """Add CREATE ... IF NOT EXISTS statements run on every new connection."""
+    _schema.extend(statements)
+
+
+def get_connection() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        directory = os.path.dirname(os.path.abspath(SHARED_STATE_DB))
+        os.makedirs(directory, exist_ok=True)
+        # Autocommit; multi-statement writes use immediate_transaction()
+        conn = sqlite3.connect(SHARED_STATE_DB, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        _local.conn = conn
+        _local.schema_applied = 0
+    if _local.schema_applied < len(_schema):
+        for statement in _schema[_local.schema_applied:]:
+            conn.execute(statement)
+        _local.schema_applied = len(_schema)
+    return conn
+
+
+@contextmanager
+def immediate_transaction() -> Iterator[sqlite3.Connection]:
+    """BEGIN IMMEDIATE ... COMMIT: takes the write lock up front, so a
+    read-check-write sequence cannot interleave with another process."""
+    conn = get_connection()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
@@ -0,0 +1,85 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, List
+
+
+_registry: List["SingleFlight"] = []
+
+
+class SingleFlight:
+    """Collapse concurrent identical calls into one shared in-flight result.
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive with the same key while it is still running wait for and share the
+    leader's result or exception. Nothing is cached once the call completes.
+
+    do() is for code running on threads, do_async() for coroutines on the
+    event loop; the two keep separate in-flight tables.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, Future] = {}
+        self._async_calls: Dict[Hashable, asyncio.Future] = {}
+        self._stats = {"leaders": 0, "coalesced": 0}
+        _registry.append(self)
+
+    def do(self, key: Hashable, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+                self._stats["leaders"] += 1
+            else:
+                self._stats["coalesced"] += 1
+        if not leader:
+            return future.result()
+        try:
+            result = fn(*args, **kwargs)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    async def do_async(self, key: Hashable, fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        future = self._async_calls.get(key)
+        if future is not None:
+            with self._lock:
+                self._stats["coalesced"] += 1
+            # shield: a cancelled follower must not cancel the shared call
+            return await asyncio.shield(future)
+        future = asyncio.get_running_loop().create_future()
+        self._async_calls[key] = future
+        with self._lock:
+            self._stats["leaders"] += 1
+        try:
+            result = await fn(*args, **kwargs)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # mark retrieved so an exception nobody else awaited is not logged
+            future.exception()
+            raise
+        finally:
+            self._async_calls.pop(key, None)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, "in_flight": len(self._calls) + len(self._async_calls)}
+
+
+def get_singleflight_stats() -> Dict[str, Dict[str, int]]:
+    """Leader/coalesced counters for every SingleFlight group."""
+    return {group.name: group.stats() for group in _registry}
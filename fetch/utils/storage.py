@@ -0,0 +1,222 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Iterable, Iterator, Optional, Tuple
+
+from uagents.storage import StorageAPI
+
+from utils.shared_db import get_connection, immediate_transaction, register_schema
+
+
+# Agent state in the shared SQLite file (WAL), usable by the agent and webhook.py at once.
+# Well-known key prefixes are stored in their own indexed tables; anything else goes to kv.
+register_schema(
+    "CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value TEXT NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS identities ("
+    " sender TEXT PRIMARY KEY, principal TEXT NOT NULL, private_key TEXT NOT NULL,"
+    " public_key TEXT, created_at REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS identities_principal ON identities (principal)",
+    "CREATE TABLE IF NOT EXISTS pending_confirmations ("
+    " sender TEXT PRIMARY KEY, payload TEXT NOT NULL, created_at REAL NOT NULL, expires_at REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS pending_confirmations_expires ON pending_confirmations (expires_at)",
+    "CREATE TABLE IF NOT EXISTS orders ("
+    " order_id TEXT PRIMARY KEY, sender TEXT, coin TEXT NOT NULL, token_amount TEXT,"
+    " amount_minor INTEGER, destination TEXT, status TEXT NOT NULL,"
+    " created_at REAL NOT NULL, updated_at REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS orders_sender ON orders (sender, created_at)",
+    "CREATE INDEX IF NOT EXISTS orders_status ON orders (status, created_at)",
+)
+
+IDENTITY_PREFIX = "identity:"
+PENDING_PREFIX = "pending_transfer:"
+ORDER_PREFIX = "order:"
+
+# Marker written once the agent's JSON key/value file has been imported
+_IMPORTED_MARKER = "storage:json_imported"
+
+# Statements are constants so sqlite3's per-connection statement cache reuses them prepared
+_SQL = {
+    "identity_get": "SELECT principal, private_key, public_key, sender FROM identities WHERE sender = ?",
+    "identity_set": (
+        "INSERT INTO identities (sender, principal, private_key, public_key, created_at) VALUES (?, ?, ?, ?, ?)"
+        " ON CONFLICT (sender) DO UPDATE SET principal = excluded.principal,"
+        " private_key = excluded.private_key, public_key = excluded.public_key"
+    ),
+    "identity_del": "DELETE FROM identities WHERE sender = ?",
+    "pending_get": "SELECT payload FROM pending_confirmations WHERE sender = ?",
+    "pending_set": (
+        "INSERT INTO pending_confirmations (sender, payload, created_at, expires_at) VALUES (?, ?, ?, ?)"
+        " ON CONFLICT (sender) DO UPDATE SET payload = excluded.payload,"
+        " created_at = excluded.created_at, expires_at = excluded.expires_at"
+    ),
+    "pending_del": "DELETE FROM pending_confirmations WHERE sender = ?",
+    "pending_expire": "DELETE FROM pending_confirmations WHERE expires_at <= ?",
+    "order_get": (
+        "SELECT order_id, sender, coin, token_amount, amount_minor, destination, status, created_at, updated_at"
+        " FROM orders WHERE order_id = ?"
+    ),
+    "order_set": (
+        "INSERT INTO orders (order_id, sender, coin, token_amount, amount_minor, destination, status, created_at, updated_at)"
+        " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+        " ON CONFLICT (order_id) DO UPDATE SET sender = excluded.sender, coin = excluded.coin,"
+        " token_amount = excluded.token_amount, amount_minor = excluded.amount_minor,"
+        " destination = excluded.destination, status = excluded.status, updated_at = excluded.updated_at"
+    ),
+    # Completed by update_order_status with one placeholder per allowed current status
+    "order_status": "UPDATE orders SET status = ?, updated_at = ? WHERE order_id = ? AND status IN ",
+    "order_del": "DELETE FROM orders WHERE order_id = ?",
+    "order_add": (
+        "INSERT INTO orders (order_id, coin, amount_minor, destination, status, created_at, updated_at)"
+        " VALUES (?, ?, ?, ?, 'open', ?, ?) ON CONFLICT (order_id) DO NOTHING"
+    ),
+    "kv_get": "SELECT value FROM kv WHERE key = ?",
+    "kv_set": "INSERT INTO kv (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+    "kv_del": "DELETE FROM kv WHERE key = ?",
+}
+
+_ORDER_FIELDS = ("order_id", "sender", "coin", "token_amount", "amount_minor", "destination", "status", "created_at", "updated_at")
+
+
+def _split(key: str) -> Tuple[str, str]:
+    for prefix, table in ((IDENTITY_PREFIX, "identity"), (PENDING_PREFIX, "pending"), (ORDER_PREFIX, "order")):
+        if key.startswith(prefix):
+            return table, key[len(prefix):]
+    return "kv", key
+
+
+class SQLiteStorage(StorageAPI):
+    """uagents StorageAPI backed by the shared SQLite file.
+
+    Drop-in for ctx.storage: identities, pending confirmations and orders get
+    indexed tables, other keys a JSON kv table. Each set() is one row write
+    instead of a rewrite of the whole store; use batch() to group many writes
+    into a single transaction.
+    """
+
+    def __init__(self):
+        self._batch = threading.local()
+
+    # ------------------------------------------------------------ StorageAPI
+
+    def get(self, key: str) -> Any | None:
+        table, ident = _split(key)
+        conn = get_connection()
+        if table == "identity":
+            row = conn.execute(_SQL["identity_get"], (ident,)).fetchone()
+            return dict(zip(("principal", "private_key", "public_key", "sender"), row)) if row else None
+        if table == "pending":
+            row = conn.execute(_SQL["pending_get"], (ident,)).fetchone()
+            return json.loads(row[0]) if row else None
+        if table == "order":
+            row = conn.execute(_SQL["order_get"], (ident,)).fetchone()
+            return dict(zip(_ORDER_FIELDS, row)) if row else None
+        row = conn.execute(_SQL["kv_get"], (ident,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def has(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def set(self, key: str, value: Any) -> None:
+        table, ident = _split(key)
+        now = time.time()
+        conn = get_connection()
+        if table == "identity":
+            conn.execute(_SQL["identity_set"], (
+                ident, value["principal"], value["private_key"], value.get("public_key"), now,
+            ))
+        elif table == "pending":
+            conn.execute(_SQL["pending_set"], (
+                ident, json.dumps(value), value.get("created_at", now), value.get("expires_at", float("inf")),
+            ))
+        elif table == "order":
+            conn.execute(_SQL["order_set"], (
+                ident, value.get("sender"), value["coin"], value.get("token_amount"), value.get("amount_minor"),
+                value.get("destination"), value.get("status", "open"), value.get("created_at", now), now,
+            ))
+        else:
+            conn.execute(_SQL["kv_set"], (ident, json.dumps(value)))
+
+    def remove(self, key: str) -> None:
+        table, ident = _split(key)
+        get_connection().execute(_SQL[f"{table}_del"], (ident,))
+
+    def clear(self) -> None:
+        with self.batch() as conn:
+            for table in ("kv", "identities", "pending_confirmations", "orders"):
+                conn.execute(f"DELETE FROM {table}")
+
+    # ------------------------------------------------------------ extras
+
+    @contextmanager
+    def batch(self) -> Iterator[Any]:
+        """Group the writes made inside the block into one transaction (nestable)."""
+        conn = get_connection()
+        depth = getattr(self._batch, "depth", 0)
+        if depth == 0:
+            conn.execute("BEGIN IMMEDIATE")
+        self._batch.depth = depth + 1
+        try:
+            yield conn
+        except BaseException:
+            self._batch.depth = depth
+            if depth == 0:
+                conn.execute("ROLLBACK")
+            raise
+        self._batch.depth = depth
+        if depth == 0:
+            conn.execute("COMMIT")
+
+    def set_many(self, items: Iterable[Tuple[str, Any]]) -> None:
+        with self.batch():
+            for key, value in items:
+                self.set(key, value)
+
+    def delete_expired_pending(self, now: Optional[float] = None) -> int:
+        """Drop every pending confirmation past its expiry (uses the expires_at index)."""
+        cur = get_connection().execute(_SQL["pending_expire"], (time.time() if now is None else now,))
+        return cur.rowcount
+
+    def import_from(self, legacy: StorageAPI) -> int:
+        """Copy a uagents KeyValueStore into this store once. Returns the number of keys copied."""
+        if self.get(_IMPORTED_MARKER):
+            return 0
+        data = getattr(legacy, "_data", None) or {}
+        with self.batch():
+            for key, value in data.items():
+                try:
+                    self.set(key, value)
+                except Exception as e:
+                    print(f"[Storage] Skipped {key} during import: {e}")
+            self.set(_IMPORTED_MARKER, {"at": time.time(), "keys": len(data)})
+        return len(data)
+
+
+def record_order(order_id: str, coin: str, status: str = "open", **fields) -> None:
+    """Insert or update an order row (shared with webhook.py whatever backend the agent uses)."""
+    SQLiteStorage().set(f"{ORDER_PREFIX}{order_id}", {"coin": coin, "status": status, **fields})
+
+
+def update_order_status(order_id: str, status: str, from_statuses: Tuple[str, ...] = ("open",)) -> bool:
+    """Move an order to status only if it is currently in one of from_statuses. True if it moved.
+
+    Settled orders stay settled: a late expiry or cancel cannot overwrite "paid".
+    """
+    placeholders = f"({', '.join('?' * len(from_statuses))})"
+    cur = get_connection().execute(
+        _SQL["order_status"] + placeholders,
+        (status, time.time(), str(order_id), *from_statuses),
+    )
+    return cur.rowcount > 0
+
+
+def claim_order(order_id: str, coin: str, amount_minor: Optional[int] = None, destination: Optional[str] = None) -> bool:
+    """Atomically move an order to "paying" before its payout. False if it is already paid or being paid.
+
+    An order the agent never recorded is added first, so a duplicate delivery of its
+    webhook still finds it claimed.
+    """
+    now = time.time()
+    with immediate_transaction() as conn:
+        conn.execute(_SQL["order_add"], (str(order_id), coin, amount_minor, destination, now, now))
+        return update_order_status(order_id, "paying", from_statuses=("open", "failed"))
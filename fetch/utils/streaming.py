@@ -0,0 +1,146 @@
+import json
+import threading
+import time
+from typing import AsyncIterator, Awaitable, Callable, Optional
+
+from config.settings import (
+    ASI1_BASE_URL,
+    ASI1_HEADERS,
+    STREAM_FIRST_FLUSH_CHARS,
+    STREAM_FLUSH_CHARS,
+    STREAM_FLUSH_INTERVAL,
+)
+from utils.http_client import ahttp_stream_lines
+
+
+_lock = threading.Lock()
+_stats = {"streams": 0, "chunks": 0, "failed": 0, "first_chunks": 0, "first_chunk_ms_total": 0.0}
+
+
+class StreamError(Exception):
+    """A streamed reply broke off after the stream was opened; chunks_sent tells whether the user already saw part of it."""
+
+    def __init__(self, message: str, chunks_sent: int):
+        super().__init__(message)
+        self.chunks_sent = chunks_sent
+
+
+async def stream_chat_completion(payload: dict, on_open: Optional[Callable[[], None]] = None) -> AsyncIterator[str]:
+    """Yield the content deltas of a streamed ASI1 /chat/completions call (SSE).
+
+    on_open is called once the response has started (status OK, first line read).
+    """
+    opened = False
+    async for line in ahttp_stream_lines(
+        "POST",
+        f"{ASI1_BASE_URL}/chat/completions",
+        headers={**ASI1_HEADERS, "Accept": "text/event-stream"},
+        json={**payload, "stream": True},
+    ):
+        if not opened:
+            opened = True
+            if on_open is not None:
+                on_open()
+        if not line or not line.startswith("data:"):
+            continue
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            return
+        try:
+            event = json.loads(data)
+        except ValueError:
+            continue
+        for choice in event.get("choices") or []:
+            piece = (choice.get("delta") or {}).get("content")
+            if piece:
+                yield piece
+
+
+def _cut_point(text: str, min_chars: int) -> int:
+    # Prefer ending a chunk at a line or sentence break, otherwise between words
+    for sep in ("\n", ". ", " "):
+        i = text.rfind(sep)
+        if i >= min_chars // 2:
+            return i + len(sep)
+    return 0
+
+
+class ChunkFlusher:
+    """Buffers streamed text and sends it as separate messages.
+
+    A chunk goes out once the buffer holds enough characters (a smaller first
+    chunk keeps time-to-first-token low) or STREAM_FLUSH_INTERVAL has passed,
+    cut at a line, sentence or word boundary.
+    """
+
+    def __init__(self, send: Callable[[str], Awaitable[None]]):
+        self._send = send
+        self._buffer = ""
+        self._started = time.monotonic()
+        self._last_flush = self._started
+        self.chunks = 0
+
+    async def add(self, piece: str) -> None:
+        self._buffer += piece
+        threshold = STREAM_FIRST_FLUSH_CHARS if self.chunks == 0 else STREAM_FLUSH_CHARS
+        due = time.monotonic() - self._last_flush >= STREAM_FLUSH_INTERVAL
+        if len(self._buffer) < threshold and not due:
+            return
+        cut = _cut_point(self._buffer, threshold if not due else 0)
+        if cut:
+            await self._flush(cut)
+
+    async def close(self) -> None:
+        if self._buffer.strip():
+            await self._flush(len(self._buffer))
+        with _lock:
+            _stats["chunks"] += self.chunks
+
+    async def _flush(self, cut: int) -> None:
+        text, self._buffer = self._buffer[:cut].strip(), self._buffer[cut:]
+        if not text:
+            return
+        await self._send(text)
+        now = time.monotonic()
+        if self.chunks == 0:
+            with _lock:
+                _stats["first_chunks"] += 1
+                _stats["first_chunk_ms_total"] += (now - self._started) * 1000
+        self._last_flush = now
+        self.chunks += 1
+
+
+async def stream_reply(payload: dict, send: Callable[[str], Awaitable[None]]) -> bool:
+    """Stream an ASI1 completion to the user as incremental messages.
+
+    Returns True once the stream completed (even if the answer was empty), and
+    False when it could not be opened, so the caller can fall back to a blocking
+    request. Raises StreamError if it breaks off after opening.
+    """
+    flusher = ChunkFlusher(send)
+    opened = []
+    with _lock:
+        _stats["streams"] += 1
+    try:
+        async for piece in stream_chat_completion(payload, on_open=lambda: opened.append(True)):
+            await flusher.add(piece)
+    except Exception as e:
+        with _lock:
+            _stats["failed"] += 1
+        if not opened:
+            print(f"[stream] could not open stream: {e}")
+            return False
+        raise StreamError(str(e), flusher.chunks) from e
+    await flusher.close()
+    return True
+
+
+def get_streaming_stats() -> dict:
+    with _lock:
+        first_chunks = _stats["first_chunks"]
+        return {
+            "streams": _stats["streams"],
+            "chunks": _stats["chunks"],
+            "failed": _stats["failed"],
+            "avg_first_chunk_ms": round(_stats["first_chunk_ms_total"] / first_chunks, 1) if first_chunks else None,
+        }
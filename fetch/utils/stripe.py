@@ -8,6 +8,7 @@ from typing import Any, Dict
 import requests
 
 from config.settings import STRIPE_API_KEY, STRIPE_API_URL, STRIPE_WEBHOOK_URL
+from utils.http_client import http_post, run_blocking
 
 
 def create_checkout_session(*, order_id: str, coin_type: str, amount_minor: int, destination_address: str, success_path: str = "/order/success", cancel_path: str = "/cancel") -> Dict[str, Any]:
@@ -23,7 +24,8 @@ def create_checkout_session(*, order_id: str, coin_type: str, amount_minor: int,
     }
 
     success_url = f"{STRIPE_WEBHOOK_URL}{success_path}?session_id={{CHECKOUT_SESSION_ID}}"
-    cancel_url = f"{STRIPE_WEBHOOK_URL}{cancel_path}"
+    # order_id is informational only; the cancel page never releases a reservation itself
+    cancel_url = f"{STRIPE_WEBHOOK_URL}{cancel_path}?order_id={order_id}"
 
     # Send both session-level metadata and payment_intent metadata for redundancy
     payload = {
@@ -52,7 +54,7 @@ def create_checkout_session(*, order_id: str, coin_type: str, amount_minor: int,
     print(f"[Stripe] Payload: {payload}")
 
     try:
-        resp = requests.post(f"{STRIPE_API_URL}/checkout/sessions", headers=headers, data=payload)
+        resp = http_post(f"{STRIPE_API_URL}/checkout/sessions", headers=headers, data=payload)
     except Exception as e:
         print(f"[Stripe] Exception while creating checkout session: {e}")
         print(f"[Stripe] Payload (sanitized): {{'mode': '{payload.get('mode')}', 'amount_minor': '{payload.get('line_items[0][price_data][unit_amount]')}', 'coin_type': '{coin_type}', 'destination': '{destination_address[:12]}...'}}")
@@ -74,6 +76,11 @@ def create_checkout_session(*, order_id: str, coin_type: str, amount_minor: int,
     return resp.json()
 
 
+async def create_checkout_session_async(**kwargs) -> Dict[str, Any]:
+    """create_checkout_session on the shared I/O pool, for async handlers."""
+    return await run_blocking(create_checkout_session, **kwargs)
+
+
 def _compute_signature(secret: str, payload: bytes, timestamp: str) -> str:
     signed_payload = f"{timestamp}.".encode("utf-8") + payload
     mac = hmac.new(secret.encode("utf-8"), msg=signed_payload, digestmod=hashlib.sha256)
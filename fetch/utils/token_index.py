@@ -0,0 +1,263 @@
+import bisect
+import difflib
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from config.settings import TOKEN_INDEX_PATH, TOKEN_INDEX_REFRESH_INTERVAL, TOKEN_INDEX_SAVE_DELAY
+from utils.http_client import http_get
+
+
+# Well-known coins, always present even before the first refresh.
+# Lower rank wins when several coins share a symbol.
+SEED_TOKENS = [
+    {"id": "bitcoin", "symbol": "BTC", "name": "Bitcoin", "rank": 1, "aliases": ["XBT"]},
+    {"id": "ethereum", "symbol": "ETH", "name": "Ethereum", "rank": 2, "aliases": ["ETHER"]},
+    {"id": "tether", "symbol": "USDT", "name": "Tether", "rank": 3, "aliases": ["TETHER USD"]},
+    {"id": "binancecoin", "symbol": "BNB", "name": "BNB", "rank": 4, "aliases": ["BINANCE COIN"]},
+    {"id": "solana", "symbol": "SOL", "name": "Solana", "rank": 5, "aliases": []},
+    {"id": "usd-coin", "symbol": "USDC", "name": "USDC", "rank": 6, "aliases": ["USD COIN"]},
+    {"id": "ripple", "symbol": "XRP", "name": "XRP", "rank": 7, "aliases": ["RIPPLE"]},
+    {"id": "dogecoin", "symbol": "DOGE", "name": "Dogecoin", "rank": 8, "aliases": []},
+    {"id": "cardano", "symbol": "ADA", "name": "Cardano", "rank": 9, "aliases": []},
+    {"id": "internet-computer", "symbol": "ICP", "name": "Internet Computer", "rank": 30, "aliases": ["DFINITY"]},
+]
+
+_UNRANKED = 10 ** 9
+
+
+class TokenIndex:
+    """In-memory coin lookup tables backed by a JSON file on disk.
+
+    Entries are {"id", "symbol", "name", "rank", "aliases"} keyed by CoinGecko id.
+    Lookups are exact on alias, id, symbol and name, with a prefix and then a
+    fuzzy match on names/ids as fallback. Coins without a market-cap rank (the
+    bulk of /coins/list) only own a symbol or name no other coin uses; shared
+    ones are left to the ranked live search.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Dict[str, dict] = {}
+        self._by_alias: Dict[str, str] = {}
+        self._by_symbol: Dict[str, str] = {}
+        self._by_name: Dict[str, str] = {}
+        self._sorted_keys: List[str] = []
+        self._loaded = False
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._save_timer: Optional[threading.Timer] = None
+        self.updated_at = 0.0
+
+    # ---------------------------------------------------------------- loading
+
+    def load(self) -> None:
+        """Load the on-disk index (if any) on top of the seed entries."""
+        entries = {e["id"]: dict(e) for e in SEED_TOKENS}
+        updated_at = 0.0
+        try:
+            if os.path.isfile(self.path):
+                with open(self.path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                updated_at = float(data.get("updated_at") or 0)
+                for item in data.get("coins", []):
+                    if isinstance(item, dict) and item.get("id"):
+                        entries[item["id"]] = self._merge_entry(entries.get(item["id"]), item)
+        except Exception as e:
+            print(f"[TokenIndex] Failed to load {self.path}: {e}")
+        with self._lock:
+            self._install(entries)
+            self.updated_at = updated_at
+            self._loaded = True
+
+    def ensure_loaded(self) -> None:
+        if not self._loaded:
+            self.load()
+
+    def _install(self, entries: Dict[str, dict]) -> None:
+        by_alias: Dict[str, str] = {}
+        by_symbol: Dict[str, str] = {}
+        by_name: Dict[str, str] = {}
+        # Best-ranked entries first so they win symbol/name collisions
+        ordered = sorted(entries.values(), key=lambda e: (e.get("rank") or _UNRANKED, len(e["id"]), e["id"]))
+        symbol_counts: Dict[str, int] = {}
+        name_counts: Dict[str, int] = {}
+        for e in ordered:
+            symbol = str(e.get("symbol", "")).upper()
+            name = str(e.get("name", "")).strip().lower()
+            symbol_counts[symbol] = symbol_counts.get(symbol, 0) + 1
+            name_counts[name] = name_counts.get(name, 0) + 1
+        for e in ordered:
+            symbol = str(e.get("symbol", "")).upper()
+            name = str(e.get("name", "")).strip().lower()
+            # An unranked coin must not claim a ticker/name shared with others (often scam copies)
+            if e.get("rank") or symbol_counts[symbol] == 1:
+                by_symbol.setdefault(symbol, e["id"])
+            if e.get("rank") or name_counts[name] == 1:
+                by_name.setdefault(name, e["id"])
+            for alias in e.get("aliases") or []:
+                by_alias.setdefault(str(alias).strip().upper(), e["id"])
+        self._entries = entries
+        self._by_alias = by_alias
+        self._by_symbol = by_symbol
+        self._by_name = by_name
+        self._sorted_keys = sorted(set(by_name) | set(entries))
+
+    @staticmethod
+    def _merge_entry(old: Optional[dict], new: dict) -> dict:
+        merged = dict(old or {})
+        merged["id"] = new["id"]
+        merged["symbol"] = str(new.get("symbol") or merged.get("symbol") or "").upper()
+        merged["name"] = new.get("name") or merged.get("name") or new["id"]
+        ranks = [r for r in (merged.get("rank"), new.get("rank")) if r]
+        merged["rank"] = min(ranks) if ranks else None
+        merged["aliases"] = sorted(set(merged.get("aliases") or []) | set(new.get("aliases") or []))
+        return merged
+
+    def _save(self) -> None:
+        with self._lock:
+            payload = {"updated_at": self.updated_at, "coins": list(self._entries.values())}
+        tmp = f"{self.path}.tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(payload, f)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            print(f"[TokenIndex] Failed to save {self.path}: {e}")
+
+    # ---------------------------------------------------------------- lookups
+
+    def _result(self, coin_id: Optional[str]) -> Optional[Tuple[str, str]]:
+        entry = self._entries.get(coin_id) if coin_id else None
+        if not entry:
+            return None
+        return entry["id"], str(entry.get("symbol") or "").upper()
+
+    def lookup(self, query: str) -> Optional[Tuple[str, str]]:
+        """Exact match on alias, id, symbol or name. Returns (coin id, SYMBOL) or None."""
+        self.ensure_loaded()
+        q = (query or "").strip()
+        if not q:
+            return None
+        upper, lower = q.upper(), q.lower()
+        return (
+            self._result(self._by_alias.get(upper))
+            or self._result(lower if lower in self._entries else None)
+            or self._result(self._by_symbol.get(upper))
+            or self._result(self._by_name.get(lower))
+        )
+
+    def search(self, query: str) -> Optional[Tuple[str, str]]:
+        """Exact lookup, then unique-ish prefix match, then a fuzzy match on names/ids."""
+        found = self.lookup(query)
+        if found:
+            return found
+        lower = (query or "").strip().lower()
+        if len(lower) < 4:
+            return None
+        keys = self._sorted_keys
+
+        # Prefix match: choose the best-ranked candidate among the first few
+        start = bisect.bisect_left(keys, lower)
+        candidates = []
+        for key in keys[start:start + 25]:
+            if not key.startswith(lower):
+                break
+            coin_id = self._by_name.get(key, key)
+            if coin_id in self._entries:
+                candidates.append(self._entries[coin_id])
+        if candidates:
+            best = min(candidates, key=lambda e: (e.get("rank") or _UNRANKED, len(e["id"])))
+            # Among several unranked candidates nothing says which one is meant
+            if best.get("rank") or len(candidates) == 1:
+                return self._result(best["id"])
+            return None
+
+        # Fuzzy match restricted to keys sharing the first letter to stay cheap
+        lo = bisect.bisect_left(keys, lower[0])
+        hi = bisect.bisect_left(keys, chr(ord(lower[0]) + 1))
+        close = difflib.get_close_matches(lower, keys[lo:hi], n=1, cutoff=0.85)
+        if close:
+            return self._result(self._by_name.get(close[0], close[0]))
+        return None
+
+    def remember(self, coin_id: str, symbol: str, name: str, rank: Optional[int] = None) -> None:
+        """Add a coin learned from a live lookup so the next lookup is local."""
+        if not coin_id:
+            return
+        self.ensure_loaded()
+        with self._lock:
+            entries = dict(self._entries)
+            entries[coin_id] = self._merge_entry(entries.get(coin_id), {"id": coin_id, "symbol": symbol, "name": name, "rank": rank})
+            self._install(entries)
+            self._schedule_save()
+
+    def _schedule_save(self) -> None:
+        # Called with the lock held; coalesces the misses of TOKEN_INDEX_SAVE_DELAY seconds into one write
+        if self._save_timer is not None:
+            return
+        self._save_timer = threading.Timer(TOKEN_INDEX_SAVE_DELAY, self._flush)
+        self._save_timer.daemon = True
+        self._save_timer.start()
+
+    def _flush(self) -> None:
+        with self._lock:
+            self._save_timer = None
+        self._save()
+
+    # ---------------------------------------------------------------- refresh
+
+    def refresh(self) -> int:
+        """Merge the CoinGecko coin list into the index. Returns the number of new or changed coins."""
+        self.ensure_loaded()
+        resp = http_get("https://api.coingecko.com/api/v3/coins/list", timeout=30)
+        resp.raise_for_status()
+        coins = resp.json() or []
+        with self._lock:
+            entries = dict(self._entries)
+            changed = 0
+            for c in coins:
+                coin_id = c.get("id")
+                if not coin_id:
+                    continue
+                old = entries.get(coin_id)
+                symbol = str(c.get("symbol") or "").upper()
+                name = c.get("name") or coin_id
+                if old and old.get("symbol") == symbol and old.get("name") == name:
+                    continue
+                entries[coin_id] = self._merge_entry(old, {"id": coin_id, "symbol": symbol, "name": name})
+                changed += 1
+            if changed:
+                self._install(entries)
+            self.updated_at = time.time()
+        self._save()
+        return changed
+
+    def start_background_refresh(self, interval: float = TOKEN_INDEX_REFRESH_INTERVAL) -> None:
+        """Refresh the index periodically on a daemon thread (first run when the file is older than interval)."""
+        if self._refresh_thread is not None or interval <= 0:
+            return
+
+        def _run():
+            while True:
+                wait = max(0.0, self.updated_at + interval - time.time())
+                if wait:
+                    time.sleep(wait)
+                try:
+                    changed = self.refresh()
+                    print(f"[TokenIndex] Refreshed: {changed} new/changed coins, {len(self._entries)} total")
+                except Exception as e:
+                    print(f"[TokenIndex] Refresh failed: {e}")
+                    time.sleep(min(interval, 600))
+
+        self.ensure_loaded()
+        self._refresh_thread = threading.Thread(target=_run, name="token-index-refresh", daemon=True)
+        self._refresh_thread.start()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+token_index = TokenIndex(TOKEN_INDEX_PATH)
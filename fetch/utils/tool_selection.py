@@ -0,0 +1,133 @@
+import json
+import threading
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Set, Tuple
+
+from config.settings import TOOL_PRUNING, TOOL_PRUNE_TOP_K, TOOL_PRUNE_MIN_SCORE
+from config.tools import tools
+from utils.pricing import ALIASES
+from utils.text import normalize_text_basic
+
+
+# Sends ASI1 only the tool schemas relevant to the query instead of all of them.
+# Each tool has action keywords; chain-specific tools also carry their coin (names taken
+# from the pricing alias table). Tools are ranked by 2 * action hits + coin hit, and the top
+# TOOL_PRUNE_TOP_K are sent. Without any action keyword match the full list is sent.
+
+_COIN_TOOLS = {
+    "BTC": "bitcoin",
+    "ETH": "ethereum",
+    "SOL": "solana",
+    "ICP": "icp",
+}
+
+_ACTION_KEYWORDS: Dict[str, Set[str]] = {
+    "help": {"help", "commands", "menu", "features", "can you do", "how do i"},
+    "get_coin_price": {"price", "prices", "cost", "worth", "value", "rate", "quote", "how much is", "usd"},
+    "address": {"address", "addr", "deposit", "receive", "receiving", "wallet"},
+    "balance": {"balance", "balances", "holdings", "funds", "how much", "have", "own"},
+    "get_portfolio": {"portfolio", "total", "all", "everything", "net worth", "balances", "assets", "holdings", "overview"},
+    "send": {"send", "transfer", "pay", "withdraw", "move"},
+    "buy_crypto": {"buy", "purchase", "checkout", "card", "stripe", "fiat", "payment link"},
+    "best_market_price": {"best", "market", "exchange", "sell", "swap", "trade", "usdt", "usdc", "cheapest", "compare"},
+}
+
+
+def _tool_keywords(name: str) -> Tuple[Set[str], str]:
+    """(action keywords, coin symbol or "") for a tool name."""
+    for coin, chain in _COIN_TOOLS.items():
+        for action in ("address", "balance"):
+            if name == f"get_{chain}_{action}":
+                return _ACTION_KEYWORDS[action], coin
+        if name == f"send_{chain}":
+            return _ACTION_KEYWORDS["send"], coin
+    return _ACTION_KEYWORDS.get(name, set()), ""
+
+
+_TOOL_ORDER = [tool["function"]["name"] for tool in tools]
+_SCHEMAS = {tool["function"]["name"]: tool for tool in tools}
+_INDEX = {name: _tool_keywords(name) for name in _TOOL_ORDER}
+_COIN_NAMES = {name.lower(): symbol for name, symbol in ALIASES.items()}
+
+_lock = threading.Lock()
+_stats = {"queries": 0, "pruned": 0, "full": 0, "tools_sent": 0, "retried_full": 0}
+
+
+class ToolSubset(NamedTuple):
+    names: Tuple[str, ...]
+    schemas: list
+    serialized: str  # JSON of schemas, reused across requests
+    pruned: bool
+
+
+def _phrases(text: str) -> Set[str]:
+    words = text.split()
+    return set(words) | {" ".join(words[i:i + 2]) for i in range(len(words) - 1)} | {
+        " ".join(words[i:i + 3]) for i in range(len(words) - 2)
+    }
+
+
+def score_tools(query: str) -> List[Tuple[str, int]]:
+    """(tool name, score) for every tool with at least one action keyword hit, best first."""
+    phrases = _phrases(normalize_text_basic(query))
+    coins = {symbol for name, symbol in _COIN_NAMES.items() if name in phrases}
+    scored = []
+    for name in _TOOL_ORDER:
+        keywords, coin = _INDEX[name]
+        hits = len(keywords & phrases)
+        if not hits:
+            continue
+        # A chain-specific tool for a coin the user did not mention is not relevant
+        if coin and coins and coin not in coins:
+            continue
+        scored.append((name, 2 * hits + (1 if coin and coin in coins else 0)))
+    scored.sort(key=lambda item: -item[1])
+    return scored
+
+
+@lru_cache(maxsize=256)
+def _subset(names: Tuple[str, ...]) -> ToolSubset:
+    schemas = [_SCHEMAS[name] for name in names]
+    return ToolSubset(names, schemas, json.dumps(schemas), len(names) < len(_TOOL_ORDER))
+
+
+def select_tools(query: str) -> ToolSubset:
+    """The tool schemas to send for this query: the top-k relevant ones, or all when unsure."""
+    scored = score_tools(query) if TOOL_PRUNING and TOOL_PRUNE_TOP_K > 0 else []
+    if not scored or scored[0][1] < TOOL_PRUNE_MIN_SCORE:
+        subset = full_tool_set()
+    else:
+        chosen = {name for name, _ in scored[:TOOL_PRUNE_TOP_K]}
+        # Keep the original order so identical selections share one cached subset
+        subset = _subset(tuple(name for name in _TOOL_ORDER if name in chosen))
+    with _lock:
+        _stats["queries"] += 1
+        _stats["pruned" if subset.pruned else "full"] += 1
+        _stats["tools_sent"] += len(subset.names)
+    return subset
+
+
+def full_tool_set() -> ToolSubset:
+    return _subset(tuple(_TOOL_ORDER))
+
+
+def record_full_retry() -> None:
+    """Count a pruned request that picked no tool and was repeated with the full list."""
+    with _lock:
+        _stats["retried_full"] += 1
+
+
+def tool_request_body(payload: dict, subset: ToolSubset) -> bytes:
+    """JSON body for payload plus the subset's tools, splicing in the pre-serialized schemas."""
+    body = json.dumps(payload)
+    return f'{body[:-1]}, "tools": {subset.serialized}}}'.encode("utf-8")
+
+
+def get_tool_selection_stats() -> dict:
+    with _lock:
+        queries = _stats["queries"]
+        return {
+            **_stats,
+            "avg_tools_sent": round(_stats["tools_sent"] / queries, 2) if queries else None,
+            "cached_subsets": _subset.cache_info().currsize,
+        }
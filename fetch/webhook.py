@@ -7,9 +7,12 @@ from flask import Flask, request, jsonify
 
 from utils.stripe import verify_webhook_signature, extract_checkout_metadata
 from utils.canister import make_canister
-from utils.candid import unwrap_candid
+from utils.candid import CanisterError, unwrap_candid
 from utils.coin import to_smallest
 from utils.pricing import get_price_usd_number
+from utils.balance_cache import record_payout
+from utils.inventory import consume, release
+from utils.storage import claim_order, update_order_status
 from config.settings import STRIPE_API_KEY
 
 
@@ -116,6 +119,9 @@ def order_success() -> tuple:
 
 @app.route("/cancel", methods=["GET"])
 def order_cancel() -> tuple:
+    # Anyone can open this URL, so it does not touch the order: while the Stripe session is
+    # still payable its reservation must stay. It lapses after INVENTORY_RESERVATION_TTL and is
+    # released by the checkout.session.expired webhook.
     return jsonify({
         "status": "cancelled",
         "message": "Payment was cancelled. No charges were made."
@@ -166,6 +172,8 @@ def stripe_webhook() -> tuple:
             now = int(time.time())
             if created_ts is not None and (now - created_ts) > 300:
                 app.logger.info("[Webhook] Session expired (>5 minutes)")
+                if metadata.get("order_id") and update_order_status(metadata["order_id"], "expired"):
+                    release(metadata["order_id"])
                 return jsonify({"status": "expired", "message": "Payment link expired (over 5 minutes)."}), 200
 
             # Determine token amount based on paid USD amount
@@ -186,28 +194,60 @@ def stripe_webhook() -> tuple:
             smallest = to_smallest(coin_type.upper(), token_amount)
             app.logger.info(f"[Webhook] token_amount={token_amount} smallest={smallest}")
 
+            order_id = metadata.get("order_id")
             try:
                 controller_priv = _load_controller_private_key()
                 wallet = make_canister("wallet", controller_priv)
-                app.logger.info(f"[Webhook] Sending token via canister: coin={coin_type} to={destination} amt={smallest}")
-                if coin_type in {"btc", "eth", "sol"}:
-                    # Use canister_send_token for chain tokens
-                    res_raw = wallet.canister_send_token(destination, smallest, coin_type)
-                    res = unwrap_candid(res_raw)
-                elif coin_type == "icp":
-                    # ICP transfer via canister_send_token (amount in e8s)
-                    res_raw = wallet.canister_send_token(destination, smallest, "icp")
-                    res = unwrap_candid(res_raw)
-                else:
+                if coin_type not in {"btc", "eth", "sol", "icp"}:
                     app.logger.warning(f"[Webhook] Unsupported coin: {coin_type}")
                     return jsonify({"status": "ignored", "reason": "unsupported coin"}), 200
-
+                # Stripe retries and duplicates deliveries: only the one that claims the order pays out
+                if order_id and not claim_order(order_id, coin_type.upper(), usd_cents, destination):
+                    app.logger.info(f"[Webhook] Order {order_id} already processed, skipping payout")
+                    return jsonify({"status": "ignored", "reason": "already processed"}), 200
+                app.logger.info(f"[Webhook] Sending token via canister: coin={coin_type} to={destination} amt={smallest}")
+                try:
+                    if coin_type in {"btc", "eth", "sol"}:
+                        # Use canister_send_token for chain tokens
+                        res_raw = wallet.canister_send_token(destination, smallest, coin_type)
+                        res = unwrap_candid(res_raw)
+                    else:
+                        # ICP transfer via canister_send_token (amount in e8s)
+                        res_raw = wallet.canister_send_token(destination, smallest, "icp")
+                        res = unwrap_candid(res_raw)
+                except CanisterError:
+                    # Refused by the canister: nothing left the wallet, so the reservation stays
+                    # reserved for the retry and the order goes back to claimable
+                    if order_id:
+                        update_order_status(order_id, "failed", from_statuses=("paying",))
+                    raise
+                except Exception:
+                    # Outcome unknown (e.g. timeout): count the tokens as sent, and park the order
+                    # so a retry cannot pay it twice; the next canister sync corrects on_hand
+                    if order_id:
+                        consume(order_id, coin_type, smallest)
+                        update_order_status(order_id, "unknown", from_statuses=("paying",))
+                    raise
+                finally:
+                    # Tell the agent process its cached balance for this address is stale
+                    record_payout(coin_type, destination)
+
+                if order_id:
+                    consume(order_id, coin_type, smallest)
+                    update_order_status(order_id, "paid", from_statuses=("paying",))
                 app.logger.info(f"[Webhook] Transfer OK: {res}")
                 return jsonify({"status": "ok", "tx": res}), 200
             except Exception as e:
                 app.logger.exception("[Webhook] Error during token send")
                 return jsonify({"status": "error", "message": str(e)}), 500
 
+        if event_type == "checkout.session.expired":
+            order_id = extract_checkout_metadata(event).get("order_id")
+            if order_id and update_order_status(order_id, "expired"):
+                release(order_id)
+            app.logger.info(f"[Webhook] Session expired, released order {order_id}")
+            return jsonify({"status": "released"}), 200
+
         # Acknowledge other events
         app.logger.info("[Webhook] Event ignored")
         return jsonify({"status": "ignored"}), 200